@@ -1,7 +1,9 @@
 import json
 import os
+import asyncio
 from datetime import datetime
 from graph import family_law_app
+from llm_client import close_connectors
 from langchain_core.messages import HumanMessage
 
 # Local history storage
@@ -43,6 +45,13 @@ def format_sources(sources):
     
     return formatted
 
+async def run_graph(state):
+    """Run one turn on a fresh event loop, releasing its pooled connections afterwards."""
+    try:
+        return await family_law_app.ainvoke(state)
+    finally:
+        await close_connectors()
+
 def main():
     """CLI interface for family law assistant."""
     print("=" * 60)
@@ -85,8 +94,8 @@ def main():
             
             print("\n🔍 Searching for relevant information...")
             
-            # Run graph
-            result = family_law_app.invoke(state)
+            # Run graph (some nodes are async)
+            result = asyncio.run(run_graph(state))
             
             # Display response
             print("\n🤖 Assistant:", result["response"])
@@ -10,17 +10,82 @@ from state import FamilyLawState
 from nodes.query_analyzer import QueryAnalyzer
 from nodes.information_gatherer import InformationGatherer
 from nodes.retriever import retrieve_documents
-from nodes.generator import generate_response
+from nodes.generator import generate_response, format_case_info
+from nodes.update_handler import apreprocess_user_message
 from node_logger import log_node_execution
-from nodes.update_handler import preprocess_user_message
+from llm_utils import humanize_key
 from typing import Dict
+import os
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Opt-in: start retrieval for a new query while it is being analyzed, so turns
+# that go straight to retrieve don't wait for the LLM and Milvus in sequence.
+# Costs one wasted embedding + search when the turn routes to gathering instead.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+
+# (conversation_id, retrieval query) -> retrieval task started during analysis.
+# Oldest entries are cancelled past this many so abandoned turns can't pile up.
+MAX_PREFETCHED_RETRIEVALS = int(os.getenv("MAX_PREFETCHED_RETRIEVALS", "32"))
+_prefetched_retrievals: Dict[tuple, asyncio.Task] = {}
+
+
+def _retrieval_key(state: FamilyLawState) -> tuple:
+    """Key for a retrieval: retrieve_documents searches on root_query + query."""
+    return (
+        state.get("conversation_id", "unknown"),
+        (state.get("root_query") or "") + (state.get("query") or "")
+    )
+
+
+def _discard_prefetch(key: tuple) -> None:
+    task = _prefetched_retrievals.pop(key, None)
+    if task is not None:
+        task.cancel()
+
+
+def _start_prefetch(key: tuple, guess: dict) -> None:
+    """Start a speculative retrieval on the running loop and remember it under key."""
+    loop = asyncio.get_running_loop()
+    # Tasks from an earlier event loop (app.py runs one per turn) can't be awaited here
+    for stale in [k for k, task in _prefetched_retrievals.items() if task.get_loop() is not loop]:
+        _discard_prefetch(stale)
+    _discard_prefetch(key)
+    while len(_prefetched_retrievals) >= MAX_PREFETCHED_RETRIEVALS:
+        _discard_prefetch(next(iter(_prefetched_retrievals)))
+    _prefetched_retrievals[key] = loop.create_task(asyncio.to_thread(retrieve_documents, guess))
+
+
+def _take_prefetch(key: tuple):
+    """Remove and return the prefetch task for key if it belongs to the running loop."""
+    task = _prefetched_retrievals.pop(key, None)
+    if task is not None and task.get_loop() is not asyncio.get_running_loop():
+        task.cancel()
+        return None
+    return task
+
+
+def refresh_case_information(state: FamilyLawState) -> None:
+    """Re-render the case summary used by the generator whenever info_collected changes."""
+    state["case_information"] = format_case_info(
+        state.get("info_collected", {}),
+        state.get("user_intent") or "legal advice"
+    )
+
+
+@log_node_execution("preprocess")
+async def preprocess_node(state: FamilyLawState) -> FamilyLawState:
+    """Classify follow-ups to earlier advice (corrections, doubts, clarifications)."""
+    if state.get("in_gathering_phase", False):
+        # Replies to the gatherer's questions are answers, not follow-ups
+        return state
+    return await apreprocess_user_message(state)
+
 
 @log_node_execution("analyze_query")
-def analyze_query_node(state: FamilyLawState) -> FamilyLawState:
+async def analyze_query_node(state: FamilyLawState) -> FamilyLawState:
     """
     Analyze query with support for re-validation.
     
@@ -43,16 +108,24 @@ def analyze_query_node(state: FamilyLawState) -> FamilyLawState:
         logger.info("⏭️  Skipping analysis - already complete")
         return state
     
+    prefetch_key = None
     try:
-        logger.info(f"🔍 === {'RE-' if is_revalidation else ''}ANALYZING QUERY ===")
+        logger.info("🔍 === %sANALYZING QUERY ===", "RE-" if is_revalidation else "")
         
         # Check if this is an update/correction scenario
         is_update = state.get("is_update", False)
         if is_update:
             logger.info("📝 Processing information update/correction")
         
+        # A confident first analysis sets root_query to the query; retrieve
+        # for that in the background while the LLM runs
+        if SPECULATIVE_RETRIEVAL and not is_revalidation and not is_update:
+            guess = {"root_query": state["query"], "query": state["query"]}
+            prefetch_key = _retrieval_key({**guess, "conversation_id": state.get("conversation_id", "unknown")})
+            _start_prefetch(prefetch_key, guess)
+        
         agent = QueryAnalyzer()
-        response = agent.analyze_query(state)
+        response = await agent.aanalyze_query(state)
         
         # Update state
         
@@ -66,23 +139,27 @@ def analyze_query_node(state: FamilyLawState) -> FamilyLawState:
             existing_info = state.get("info_collected", {})
             existing_info.update(new_info)
             state["info_collected"] = existing_info
-            logger.info(f"   Updated info: {list(state['info_collected'].keys())}")
+            logger.info("   Updated info: %s", list(state["info_collected"].keys()))
         else:
             state["info_collected"] = new_info
+        refresh_case_information(state)
         
         state["analysis_complete"] = True
         
-        logger.info(f"   Intent: {state['user_intent']}")
-        logger.info(f"   Info collected: {list(state['info_collected'].keys())}")
-        logger.info(f"   Info needed: {state['info_needed_list']}")
-        logger.info(f"   Sufficient: {state['has_sufficient_info']}")
+        logger.info("   Intent: %s", state["user_intent"])
+        logger.info("   Info collected: %s", list(state["info_collected"].keys()))
+        logger.info("   Info needed: %s", state["info_needed_list"])
+        logger.info("   Sufficient: %s", state["has_sufficient_info"])
         
         # Check intent confidence
         intent_confidence = response.get("intent_confidence", "high")
         if intent_confidence == "low" or not response.get("user_intent"):
             logger.info("❓ Low confidence - requesting clarification")
             state["needs_clarification"] = True
-            state["clarification_question"] = "Could you please provide more details about your legal situation?"
+            state["clarification_question"] = (
+                response.get("follow_up_question")
+                or "Could you please provide more details about your legal situation?"
+            )
         else:
             state["needs_clarification"] = False
             if not is_update and state["user_intent"]:
@@ -92,17 +169,26 @@ def analyze_query_node(state: FamilyLawState) -> FamilyLawState:
                 state["has_sufficient_info"] = True
                 state["in_gathering_phase"] = False
             else:
-                logger.info(f"📝 Need to gather {len(state['info_needed_list'])} items")
+                logger.info("📝 Need to gather %d items", len(state["info_needed_list"]))
                 state["in_gathering_phase"] = True
                 state["gathering_step"] = 0
+                # First question drafted by the analyzer (used by gather_info if still relevant)
+                state["follow_up_question"] = response.get("follow_up_question")
+                state["current_question_target"] = state["info_needed_list"][0]
         
         # Reset update flag
         state["is_update"] = False
         
+        # Drop the speculative retrieval if this turn won't retrieve now
+        if prefetch_key and (state["needs_clarification"] or state["in_gathering_phase"]):
+            _discard_prefetch(prefetch_key)
+        
         return state
         
     except Exception as e:
-        logger.error(f"❌ Query Analyzer failed: {e}", exc_info=True)
+        logger.error("❌ Query Analyzer failed: %s", e, exc_info=True)
+        if prefetch_key:
+            _discard_prefetch(prefetch_key)
         state["has_sufficient_info"] = True
         state["analysis_complete"] = True
         state["in_gathering_phase"] = False
@@ -110,15 +196,15 @@ def analyze_query_node(state: FamilyLawState) -> FamilyLawState:
 
 
 @log_node_execution("gather_info")
-def gather_information_node(state: FamilyLawState) -> FamilyLawState:
+async def gather_information_node(state: FamilyLawState) -> FamilyLawState:
     """Gather information iteratively with logging."""
     
     try:
         step = state.get("gathering_step", 0)
-        logger.info(f"📊 === GATHERING INFORMATION (Step {step}) ===")
+        logger.info("📊 === GATHERING INFORMATION (Step %s) ===", step)
         
         gatherer = InformationGatherer()
-        response = gatherer.gather_next_information(state)
+        response = await gatherer.agather_next_information(state)
         
         # Update state
         state["info_collected"] = response.get("info_collected", {})
@@ -127,9 +213,10 @@ def gather_information_node(state: FamilyLawState) -> FamilyLawState:
         state["needs_more_info"] = response.get("needs_more_info", False)
         state["gathering_step"] = response.get("gathering_step", 0)
         state["current_question_target"] = response.get("current_question_target")
+        refresh_case_information(state)
         
-        logger.info(f"   ✓ Collected: {len(state['info_collected'])} items")
-        logger.info(f"   ✓ Needed: {len(state['info_needed_list'])} items")
+        logger.info("   ✓ Collected: %d items", len(state["info_collected"]))
+        logger.info("   ✓ Needed: %d items", len(state["info_needed_list"]))
         
         # Check completion
         if not state["needs_more_info"]:
@@ -141,7 +228,7 @@ def gather_information_node(state: FamilyLawState) -> FamilyLawState:
         return state
         
     except Exception as e:
-        logger.error(f"❌ Information Gatherer failed: {e}", exc_info=True)
+        logger.error("❌ Information Gatherer failed: %s", e, exc_info=True)
         state["has_sufficient_info"] = True
         state["in_gathering_phase"] = False
         state["needs_more_info"] = False
@@ -172,7 +259,7 @@ def revalidate_information_node(state: FamilyLawState) -> FamilyLawState:
         
         # Format collected info as context
         info_context = "\n".join([
-            f"- {key.replace('_', ' ').title()}: {value}"
+            f"- {humanize_key(key)}: {value}"
             for key, value in info_collected.items()
         ])
         
@@ -192,8 +279,8 @@ def revalidate_information_node(state: FamilyLawState) -> FamilyLawState:
         additional_info_needed = response.get("info_needed_list", [])
         
         if additional_info_needed:
-            logger.info(f"⚠️  Re-validation found {len(additional_info_needed)} missing items")
-            logger.info(f"   Additional info needed: {additional_info_needed}")
+            logger.info("⚠️  Re-validation found %d missing items", len(additional_info_needed))
+            logger.info("   Additional info needed: %s", additional_info_needed)
             
             # Add to existing needed list (avoid duplicates)
             current_needed = set(state.get("info_needed_list", []))
@@ -216,16 +303,26 @@ def revalidate_information_node(state: FamilyLawState) -> FamilyLawState:
             return state
     
     except Exception as e:
-        logger.error(f"❌ Re-validation failed: {e}", exc_info=True)
+        logger.error("❌ Re-validation failed: %s", e, exc_info=True)
         # On error, proceed anyway
         state["has_sufficient_info"] = True
         return state
 
 
 @log_node_execution("retrieve")
-def retrieve_documents_node(state: FamilyLawState) -> FamilyLawState:
+async def retrieve_documents_node(state: FamilyLawState) -> FamilyLawState:
     """Retrieve documents with logging."""
-    result = retrieve_documents(state)
+    prefetched = _take_prefetch(_retrieval_key(state))
+    try:
+        if prefetched is not None:
+            logger.info("⚡ Using retrieval started during analysis")
+            result = await prefetched
+        else:
+            result = await asyncio.to_thread(retrieve_documents, state)
+    finally:
+        # No-op once awaited; stops the search if this node is cancelled or fails
+        if prefetched is not None:
+            prefetched.cancel()
     state.update(result)
     return state
 
@@ -251,7 +348,7 @@ def route_after_analysis(state: FamilyLawState) -> str:
         logger.info("🔀 Routing → retrieval (sufficient info)")
         return "retrieve"
     else:
-        logger.info(f"🔀 Routing → gather_info (need {len(info_needed)} items)")
+        logger.info("🔀 Routing → gather_info (need %d items)", len(info_needed))
         return "gather_info"
 
 
@@ -290,7 +387,7 @@ def format_clarification_response(state: FamilyLawState) -> dict:
         "Could you please clarify your legal situation?"
     )
     
-    logger.info(f"❓ Sending clarification: {clarification[:100]}...")
+    logger.info("❓ Sending clarification: %.100s...", clarification)
     
     return {
         "response": clarification,
@@ -309,7 +406,7 @@ def format_follow_up_response(state: FamilyLawState) -> dict:
     info_collected = state.get("info_collected", {})
     info_needed = state.get("info_needed_list", [])
     
-    logger.info(f"📝 Asking follow-up: {follow_up[:100]}...")
+    logger.info("📝 Asking follow-up: %.100s...", follow_up)
     
     return {
         "response": follow_up,
@@ -333,14 +430,13 @@ def create_graph():
     workflow.add_node("gather_info", gather_information_node)
     workflow.add_node("ask_question", format_follow_up_response)
     workflow.add_node("revalidate", revalidate_information_node)
-    # workflow.add_node("preprocess", preprocess_user_message)
+    workflow.add_node("preprocess", preprocess_node)
     workflow.add_node("retrieve", retrieve_documents_node)
     workflow.add_node("generate", generate_response_node)
     
     # Edges
-    # workflow.add_edge(START, "preprocess")
-    # workflow.add_edge("preprocess", "analyze_query")
-    workflow.add_edge(START, "analyze_query")
+    workflow.add_edge(START, "preprocess")
+    workflow.add_edge("preprocess", "analyze_query")
     
     workflow.add_conditional_edges(
         "analyze_query",
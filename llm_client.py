@@ -0,0 +1,172 @@
+"""
+Shared HTTP transport for Hugging Face inference calls.
+
+huggingface_hub caches one requests.Session per thread, so LLM calls made from
+FastAPI's worker threads each open their own TCP/TLS connections, and its async
+client opens a fresh aiohttp session (and connection) for every request. This
+module installs a single pooled, keep-alive session that every node shares,
+keep-alive aiohttp connectors for async calls, a shared chat-model factory and
+a concurrency limit for async LLM calls.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from functools import lru_cache
+from typing import Optional
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from huggingface_hub import AsyncInferenceClient
+
+try:
+    from huggingface_hub import configure_http_backend
+except ImportError:  # removed in huggingface_hub 1.0 (httpx transport)
+    configure_http_backend = None
+from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+
+logger = logging.getLogger(__name__)
+
+HF_HTTP_POOL_SIZE = int(os.getenv("HF_HTTP_POOL_SIZE", "32"))
+
+# Max in-flight async LLM requests per event loop (HF serverless allows ~500/min)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _pooled_session() -> requests.Session:
+    """Return the process-wide session (urllib3 pools are thread-safe)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=HF_HTTP_POOL_SIZE,
+                pool_block=False
+            )
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            logger.info("🔌 HF HTTP pool ready (maxsize=%s)", HF_HTTP_POOL_SIZE)
+        return _session
+
+
+def configure_hf_session() -> None:
+    """Route all huggingface_hub HTTP calls through the shared pooled session."""
+    if configure_http_backend is None:
+        return
+    configure_http_backend(backend_factory=_pooled_session)
+
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def llm_semaphore() -> asyncio.Semaphore:
+    """Semaphore bounding concurrent async LLM calls on the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
+
+
+_connectors = weakref.WeakKeyDictionary()
+
+
+def _shared_connector() -> aiohttp.TCPConnector:
+    """Keep-alive connector for the running event loop."""
+    loop = asyncio.get_running_loop()
+    connector = _connectors.get(loop)
+    if connector is None or connector.closed:
+        connector = _connectors[loop] = aiohttp.TCPConnector(
+            limit=HF_HTTP_POOL_SIZE,
+            keepalive_timeout=60
+        )
+    return connector
+
+
+async def close_connectors() -> None:
+    """Close the running loop's keep-alive connector (call before the loop ends)."""
+    connector = _connectors.pop(asyncio.get_running_loop(), None)
+    if connector is not None:
+        await connector.close()
+
+
+class PooledAsyncInferenceClient(AsyncInferenceClient):
+    """
+    AsyncInferenceClient whose per-request sessions share one keep-alive connector.
+
+    Mirrors AsyncInferenceClient._get_client_session (huggingface_hub 0.36) but
+    passes connector_owner=False, so closing a request's session keeps its
+    connection open for the next call. pyproject pins huggingface_hub below 1.0
+    and test/test_llm_client.py fails if the overridden hook changes.
+    """
+
+    def _get_client_session(self, headers: Optional[dict] = None) -> aiohttp.ClientSession:
+        client_headers = self.headers.copy()
+        if headers is not None:
+            client_headers.update(headers)
+
+        session = aiohttp.ClientSession(
+            headers=client_headers,
+            cookies=self.cookies,
+            timeout=aiohttp.ClientTimeout(self.timeout),
+            trust_env=self.trust_env,
+            connector=_shared_connector(),
+            connector_owner=False
+        )
+        self._sessions[session] = set()
+
+        # Register responses so they are released when the session closes
+        session._wrapped_request = session._request
+
+        async def _request(method, url, **kwargs):
+            response = await session._wrapped_request(method, url, **kwargs)
+            self._sessions[session].add(response)
+            return response
+
+        session._request = _request
+        session._close = session.close
+
+        async def close_session():
+            for response in self._sessions[session]:
+                response.close()
+            await session._close()
+            self._sessions.pop(session, None)
+
+        session.close = close_session
+        return session
+
+
+@lru_cache(maxsize=None)
+def get_chat_model(
+    max_new_tokens: int,
+    temperature: float,
+    task: str = "conversational",
+    api_key: Optional[str] = None,
+    repo_id: Optional[str] = None
+) -> ChatHuggingFace:
+    """
+    Shared ChatHuggingFace for a given generation config.
+
+    Nodes that build their LLM per call reuse one client (and its connections)
+    instead of constructing a new endpoint wrapper every graph step.
+    repo_id defaults to LLM_MODEL.
+    """
+    configure_hf_session()
+
+    endpoint = HuggingFaceEndpoint(
+        repo_id=repo_id or os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct"),
+        huggingfacehub_api_token=api_key or os.getenv("HUGGINGFACE_API_KEY"),
+        task=task,
+        max_new_tokens=max_new_tokens,
+        temperature=temperature,
+    )
+    # Same configuration, pooled connections for ainvoke
+    endpoint.async_client.__class__ = PooledAsyncInferenceClient
+
+    return ChatHuggingFace(llm=endpoint)
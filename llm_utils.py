@@ -0,0 +1,63 @@
+"""
+Small helpers shared by the LLM nodes: reading structured output from model
+responses and formatting state fields for prompts.
+"""
+
+import json
+import string
+from functools import lru_cache
+from typing import Optional
+
+_DECODER = json.JSONDecoder()
+
+
+def parse_llm_json(text: str) -> Optional[dict]:
+    """
+    Return the first JSON object in an LLM response, or None.
+
+    Handles ```json fences and text before/after the object in one pass:
+    raw_decode parses from each '{' and ignores whatever follows the object.
+    """
+    start = text.find("{")
+    while start != -1:
+        try:
+            data, _ = _DECODER.raw_decode(text, start)
+            if isinstance(data, dict):
+                return data
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+
+@lru_cache(maxsize=1024)
+def humanize_key(key: str) -> str:
+    """Turn a state key like 'marriage_date' into the prompt label 'Marriage Date'."""
+    return key.replace("_", " ").title()
+
+
+class PromptTemplate:
+    """
+    A str.format template parsed once.
+
+    format(**fields) gives the same result as template.format(**fields) for
+    plain {name} fields, but only joins the pre-split literal spans and values
+    instead of re-parsing the template (and its {{ }} escapes) on every call.
+    """
+
+    __slots__ = ("template", "_parts")
+
+    def __init__(self, template: str):
+        self.template = template
+        parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if spec or conversion:
+                raise ValueError(f"Unsupported format spec in prompt field {field!r}")
+            parts.append((literal, field))
+        self._parts = tuple(parts)
+
+    def format(self, **fields) -> str:
+        return "".join(
+            literal if field is None else literal + str(fields[field])
+            for literal, field in self._parts
+        )
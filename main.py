@@ -50,6 +50,7 @@ from typing import List, Optional
 import json
 import os
 from graph import family_law_app
+from nodes.generator import DISCLAIMER
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from config import get_settings
 import traceback
@@ -605,14 +606,23 @@ async def chat_stream(request: Request, query_request: QueryRequest):
                     logger.info(f"→ Retrieved {len(sources)} sources")
                     yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
                 
-                # LLM streaming
-                if kind == "on_chat_model_stream":
+                # LLM streaming (only the generator's tokens are the answer;
+                # the analyzer and gatherer stream their JSON internally)
+                if kind == "on_chat_model_stream" and event.get("metadata", {}).get("langgraph_node") == "generate":
                     content = event["data"]["chunk"].content
                     if content:
                         message_type = "final_response"
                         accumulated_response += content
                         yield f"data: {json.dumps({'type': 'token', 'content': content})}\n\n"
                 
+                # Generator finished: stream the disclaimer it appended, which
+                # never passes through the model token stream
+                if kind == "on_chain_end" and event.get("name") == "generate":
+                    output = event.get("data", {}).get("output", {})
+                    if output.get("response", "").endswith(DISCLAIMER) and not accumulated_response.endswith(DISCLAIMER):
+                        accumulated_response += DISCLAIMER
+                        yield f"data: {json.dumps({'type': 'token', 'content': DISCLAIMER})}\n\n"
+                
                 # Completion
                 if kind == "on_chain_end" and event.get("name") == "LangGraph":
                     output = event.get("data", {}).get("output", {})
@@ -10,6 +10,21 @@ COLLECTION_NAME = "family_law_cases"
 EMBEDDINGS_DIR = "./data/embeddings"
 EMBEDDING_DIM = 384  # all-MiniLM-L6-v2 dimension
 
+# Vector index. HNSW by default; IVF_PQ stores each vector as 48 one-byte codes
+# (~32x smaller) for corpora too large to keep in RAM, at some recall cost
+# (see MILVUS_RERANK_FACTOR in nodes/retriever.py). IVF_FLAT is the original index.
+MILVUS_INDEX_TYPE = os.getenv("MILVUS_INDEX_TYPE", "HNSW").upper()
+INDEX_BUILD_PARAMS = {
+    "HNSW": {"M": 16, "efConstruction": 200},
+    "IVF_FLAT": {"nlist": 128},
+    "IVF_PQ": {"nlist": 128, "m": 48, "nbits": 8},
+}
+if MILVUS_INDEX_TYPE not in INDEX_BUILD_PARAMS:
+    raise ValueError(
+        f"Unsupported MILVUS_INDEX_TYPE {MILVUS_INDEX_TYPE!r}; "
+        f"expected one of: {', '.join(INDEX_BUILD_PARAMS)}"
+    )
+
 def connect_milvus():
     """Connect to Milvus standalone."""
     connections.connect(
@@ -41,11 +56,11 @@ def create_collection():
     schema = CollectionSchema(fields=fields, description="Family Law Cases RAG")
     collection = Collection(name=COLLECTION_NAME, schema=schema)
     
-    # Create index
+    # Create index (recall is tuned at query time via ef / nprobe)
     index_params = {
         "metric_type": "COSINE",
-        "index_type": "IVF_FLAT",
-        "params": {"nlist": 128}
+        "index_type": MILVUS_INDEX_TYPE,
+        "params": INDEX_BUILD_PARAMS[MILVUS_INDEX_TYPE]
     }
     collection.create_index(field_name="embedding", index_params=index_params)
     print(f"✅ Collection '{COLLECTION_NAME}' created with index")
@@ -6,6 +6,8 @@ enabling comprehensive evaluation and debugging.
 """
 
 import json
+import time
+import inspect
 import logging
 from datetime import datetime
 from pathlib import Path
@@ -253,6 +255,7 @@ class NodeExecutionLogger:
 def log_node_execution(node_name: str):
     """
     Decorator to automatically log node executions.
+    Works for both sync and async node functions.
     
     Usage:
         @log_node_execution("my_node")
@@ -261,16 +264,46 @@ def log_node_execution(node_name: str):
             return state
     """
     def decorator(func):
-        @wraps(func)
-        def wrapper(state, *args, **kwargs):
-            import time
+        def log(state, input_state, result, start_time, error):
+            execution_time = time.time() - start_time
+            output_state = result if error is None else state
             
-            logger_instance = NodeExecutionLogger()
-            conversation_id = state.get("conversation_id", "unknown")
+            NodeExecutionLogger().log_node_execution(
+                conversation_id=state.get("conversation_id", "unknown"),
+                node_name=node_name,
+                input_state=input_state,
+                output_state=output_state,
+                execution_time=execution_time,
+                error=error
+            )
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(state, *args, **kwargs):
+                # Capture input state
+                input_state = dict(state)
+                start_time = time.time()
+                result = None
+                error = None
+                
+                try:
+                    # Execute node
+                    result = await func(state, *args, **kwargs)
+                    return result
+                except Exception as e:
+                    error = e
+                    raise
+                finally:
+                    log(state, input_state, result, start_time, error)
             
+            return async_wrapper
+        
+        @wraps(func)
+        def wrapper(state, *args, **kwargs):
             # Capture input state
             input_state = dict(state)
             start_time = time.time()
+            result = None
             error = None
             
             try:
@@ -282,17 +315,7 @@ def log_node_execution(node_name: str):
                 raise
             finally:
                 # Log execution
-                execution_time = time.time() - start_time
-                output_state = result if error is None else state
-                
-                logger_instance.log_node_execution(
-                    conversation_id=conversation_id,
-                    node_name=node_name,
-                    input_state=input_state,
-                    output_state=output_state,
-                    execution_time=execution_time,
-                    error=error
-                )
+                log(state, input_state, result, start_time, error)
         
         return wrapper
     return decorator
@@ -11,10 +11,23 @@ import os
 import logging
 from dataclasses import dataclass
 from enum import Enum
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+from functools import cached_property
+from llm_client import get_chat_model
+from llm_utils import parse_llm_json, PromptTemplate
 
 logger = logging.getLogger(__name__)
 
+# Per-call decode budget: the prediction JSON is a few short lists (~400 tokens),
+# well under the endpoint's 2048-token ceiling.
+PREDICTION_MAX_TOKENS = int(os.getenv("PREDICTION_MAX_TOKENS", "768"))
+
+# Precedent text per prompt entry (~75 tokens each, five precedents)
+PRECEDENT_SUMMARY_CHARS = 300
+
+# Model for predictions; a smaller (e.g. quantized 3B) model can be swapped in
+# here without affecting the main advice generator.
+PREDICTION_LLM_MODEL = os.getenv("PREDICTION_LLM_MODEL") or os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct")
+
 
 class CaseStrength(Enum):
     """Case strength categories."""
@@ -25,7 +38,7 @@ class CaseStrength(Enum):
     VERY_WEAK = "very_weak"
 
 
-@dataclass
+@dataclass(slots=True)
 class OutcomePrediction:
     """Structured outcome prediction result."""
     win_probability_range: Tuple[int, int]  # e.g., (60, 75) means 60-75%
@@ -103,18 +116,29 @@ OUTPUT FORMAT (JSON):
 
 YOUR ANALYSIS:"""
     
+    # Parsed once; .format() only joins the literal spans with the fields
+    _PROMPT_TEMPLATE = PromptTemplate(PREDICTION_PROMPT)
+    
+    DISCLAIMERS = (
+        "This prediction is based on analysis of precedents and case factors, not a guarantee of outcome.",
+        "Actual case outcomes depend on many factors including: quality of legal representation, evidence presentation, judge discretion, and procedural factors.",
+        "Legal predictions are inherently uncertain. Always consult with a qualified attorney.",
+        "Settlement or alternative dispute resolution may be preferable to litigation in many cases.",
+        "Court procedures and outcomes can vary significantly by jurisdiction and specific court."
+    )
+    
     def __init__(self, huggingface_api_key: str = None):
-        """Initialize the predictor with LLM."""
-        api_key = huggingface_api_key or os.getenv("HUGGINGFACE_API_KEY")
-        
-        self.llm = ChatHuggingFace(
-            llm=HuggingFaceEndpoint(
-                repo_id="meta-llama/Llama-3.1-8B-Instruct",
-                huggingfacehub_api_token=api_key,
-                task="text-generation",
-                max_new_tokens=2048,
-                temperature=0.5,  # Lower temperature for more conservative predictions
-            )
+        """Initialize the predictor; the LLM client is shared and created on first use."""
+        self.huggingface_api_key = huggingface_api_key
+    
+    @cached_property
+    def llm(self):
+        return get_chat_model(
+            max_new_tokens=2048,
+            temperature=0.5,  # Lower temperature for more conservative predictions
+            task="text-generation",
+            api_key=self.huggingface_api_key,
+            repo_id=PREDICTION_LLM_MODEL
         )
     
     def predict_outcome(
@@ -144,7 +168,7 @@ YOUR ANALYSIS:"""
             precedents_str = self._format_precedents(retrieved_precedents)
             
             # Build prompt
-            prompt = self.PREDICTION_PROMPT.format(
+            prompt = self._PROMPT_TEMPLATE.format(
                 user_intent=user_intent,
                 info_collected=info_str,
                 precedents=precedents_str
@@ -156,19 +180,13 @@ YOUR ANALYSIS:"""
                 HumanMessage(content=prompt)
             ]
             
-            response = self.llm.invoke(conversation)
+            response = self.llm.invoke(conversation, max_tokens=PREDICTION_MAX_TOKENS)
             response_text = response.content.strip()
             
-            # Parse JSON response
-            import json
-            
-            # Extract JSON
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            prediction_data = json.loads(response_text)
+            # Parse JSON response (fenced or not, in one pass)
+            prediction_data = parse_llm_json(response_text)
+            if prediction_data is None:
+                raise ValueError(f"No JSON object in prediction response: {response_text[:200]}")
             
             # Build structured prediction
             prediction = OutcomePrediction(
@@ -216,19 +234,16 @@ YOUR ANALYSIS:"""
             formatted.append(f"\n[Precedent {i}]")
             formatted.append(f"Title: {precedent.get('metadata', {}).get('title', 'Unknown')}")
             formatted.append(f"Relevance: {precedent.get('score', 0):.0%}")
-            formatted.append(f"Summary: {precedent.get('content', '')[:300]}...")
+            content = precedent.get('content', '')
+            if len(content) > PRECEDENT_SUMMARY_CHARS:
+                content = content[:PRECEDENT_SUMMARY_CHARS] + "..."
+            formatted.append(f"Summary: {content}")
         
         return "\n".join(formatted)
     
     def _get_disclaimers(self) -> List[str]:
-        """Get standard disclaimers for predictions."""
-        return [
-            "This prediction is based on analysis of precedents and case factors, not a guarantee of outcome.",
-            "Actual case outcomes depend on many factors including: quality of legal representation, evidence presentation, judge discretion, and procedural factors.",
-            "Legal predictions are inherently uncertain. Always consult with a qualified attorney.",
-            "Settlement or alternative dispute resolution may be preferable to litigation in many cases.",
-            "Court procedures and outcomes can vary significantly by jurisdiction and specific court."
-        ]
+        """Get standard disclaimers for predictions (a fresh copy per prediction)."""
+        return list(self.DISCLAIMERS)
     
     def _get_fallback_prediction(self) -> OutcomePrediction:
         """Fallback prediction when analysis fails."""
@@ -11,21 +11,38 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from typing import Dict
 from state import FamilyLawState
 import os
+import re
 import logging
+import tiktoken
+from functools import lru_cache
 from nodes.case_outcome_predictor import CaseOutcomePredictor
 from nodes.reasoning_explainer import (
     ReasoningExplainer, 
     create_case_summary
 )
 from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+from llm_client import configure_hf_session
+from llm_utils import humanize_key
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Self-hosted TGI endpoint (see the `tgi` service in docker-compose.yml, which
+# serves INT8 weights via --quantize). Falls back to the HF serverless API.
+LLM_ENDPOINT_URL = os.getenv("LLM_ENDPOINT_URL")
+
+if LLM_ENDPOINT_URL:
+    _llm_target = {"endpoint_url": LLM_ENDPOINT_URL}
+else:
+    _llm_target = {"repo_id": os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct")}
+
+# Reuse keep-alive connections to the endpoint across requests
+configure_hf_session()
+
 # Initialize LLM
 llm = ChatHuggingFace(
     llm=HuggingFaceEndpoint(
-        repo_id = os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct"),
+        **_llm_target,
         huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY"),
         task="conversational",
         max_new_tokens=2048,
@@ -33,6 +50,46 @@ llm = ChatHuggingFace(
     )
 )
 
+# Optional smaller model for simple cases (disabled unless SMALL_LLM_MODEL is set)
+SMALL_LLM_MODEL = os.getenv("SMALL_LLM_MODEL")
+SIMPLE_QUERY_MAX_CHARS = 200
+SIMPLE_CASE_MAX_FIELDS = 3
+_COMPLEX_INTENT_RE = re.compile(r"violence|abuse|cruelty|custody|dowry", re.IGNORECASE)
+
+small_llm = None
+if SMALL_LLM_MODEL:
+    small_llm = ChatHuggingFace(
+        llm=HuggingFaceEndpoint(
+            repo_id=SMALL_LLM_MODEL,
+            huggingfacehub_api_token=os.getenv("HUGGINGFACE_API_KEY"),
+            task="conversational",
+            max_new_tokens=1024,
+            temperature=0.7,
+        )
+    )
+
+def response_token_budget(query: str, info_collected: Dict, user_intent: str) -> int:
+    """Cap generated tokens by case complexity: 512 simple, 1024 medium, 2048 for complex cases."""
+    if _COMPLEX_INTENT_RE.search(user_intent or "") or len(info_collected) > SIMPLE_CASE_MAX_FIELDS * 2:
+        return 2048
+    if len(query) < 150 and len(info_collected) <= SIMPLE_CASE_MAX_FIELDS:
+        return 512
+    if len(query) < 400:
+        return 1024
+    return 2048
+
+def select_llm(query: str, info_collected: Dict, user_intent: str):
+    """Use the small model for short, low-detail, non-sensitive cases; otherwise the main model."""
+    if (
+        small_llm is not None
+        and len(query) < SIMPLE_QUERY_MAX_CHARS
+        and len(info_collected) <= SIMPLE_CASE_MAX_FIELDS
+        and not _COMPLEX_INTENT_RE.search(user_intent or "")
+    ):
+        logger.info("🪶 Routing to small model: %s", SMALL_LLM_MODEL)
+        return small_llm
+    return llm
+
 example_query = ("I got engaged in June 2018 and married in February 2019. Soon after, my husband stopped caring for me and the household, then left. "
 "He abused me for talking to friends and about my past, which he already knew. Yesterday, he called me to meet, and I hoped we could reconcile. "
 "Instead, he beat me and stopped me from leaving. I escaped this morning. I want a divorce as soon as possible.")
@@ -62,21 +119,136 @@ f"2. {example_responses[1]}\n"
 f"3. {example_responses[2]}\n"
 )
 
+RESPONSE_PROMPT = """Provide complete legal advice (experienced lawyer) based on the case information and precedents below.
+
+{case_information}
+
+{legal_context}
+
+CLIENT QUERY: {query}
+
+Provide a COMPLETE, well-structured response with:
+- Internally reason as Issue → Rule (statute/precedent) → Application → Conclusion, but only output the detailed final answer.
+- Prefer authoritative Indian sources and cite succinctly, e.g., (IPC s.498A), (HMA 1955 s.13), (CrPC s.125).
+- If a precise section is uncertain, mention it briefly without guessing.
+- Give concise response to ensure a Flesch Reading Ease score of atleast 55+.
+- Explain legal terms briefly in everyday language when necessary.
+- Give practical guidance wherever possible, focusing on what a person can realistically do.
+
+Use empathetic, professional, simple language. Be thorough - this is important for the client's case.
+
+YOUR COMPLETE RESPONSE:"""
+
+# Optional LLMLingua-2 compression of precedent text (pip install ".[compression]")
+ENABLE_CONTEXT_COMPRESSION = os.getenv("ENABLE_CONTEXT_COMPRESSION", "false").lower() == "true"
+CONTEXT_COMPRESSION_MODEL = os.getenv(
+    "CONTEXT_COMPRESSION_MODEL", "microsoft/llmlingua-2-xlm-roberta-large-meetingbank"
+)
+CONTEXT_COMPRESSION_RATE = float(os.getenv("CONTEXT_COMPRESSION_RATE", "0.5"))
+
+_compressor = None
+
+def _get_compressor():
+    """Load the LLMLingua-2 compressor on first use."""
+    global _compressor
+    if _compressor is None:
+        from llmlingua import PromptCompressor
+        _compressor = PromptCompressor(model_name=CONTEXT_COMPRESSION_MODEL, use_llmlingua2=True)
+    return _compressor
+
+@lru_cache(maxsize=10000)
+def compress_content(content: str) -> str:
+    """Drop low-information tokens from precedent text, keeping sentence breaks and section numbers."""
+    try:
+        result = _get_compressor().compress_prompt(
+            content,
+            rate=CONTEXT_COMPRESSION_RATE,
+            force_tokens=["\n", ".", "?", "!"],
+            force_reserve_digit=True,  # keeps citations like s.498A / s.125 intact
+        )
+        return result["compressed_prompt"]
+    except Exception as e:
+        logger.warning("Context compression failed, using full text: %s", e)
+        return content
+
+def chunk_content(chunk: Dict) -> str:
+    """Return the prompt text for a chunk, compressing and caching it on the chunk if enabled."""
+    if chunk.get("content_compressed"):
+        return chunk["content_compressed"]
+    if not ENABLE_CONTEXT_COMPRESSION:
+        return chunk["content"]
+    chunk["content_compressed"] = compress_content(chunk["content"])
+    return chunk["content_compressed"]
+
+# Prompt budget for precedent text (≈4 chars per token)
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "1200"))
+MIN_CHUNK_SCORE = float(os.getenv("MIN_CHUNK_SCORE", "0.35"))
+CHARS_PER_TOKEN = 4
+
+DUPLICATE_JACCARD = 0.6
+SHINGLE_SIZE = 5
+
+def _shingles(text: str) -> set:
+    """5-word shingles used to spot precedents quoting the same passage."""
+    words = text.lower().split()
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def select_chunks(retrieved_chunks: list) -> list:
+    """Top 5 distinct chunks by score, dropping weak matches (the best one is always kept)."""
+    ranked = sorted(retrieved_chunks, key=lambda c: c['score'], reverse=True)
+    selected, kept_shingles = [], []
+
+    for chunk in ranked:
+        if selected and chunk['score'] < MIN_CHUNK_SCORE:
+            break
+        shingles = _shingles(chunk['content'] or "")
+        if any(
+            len(shingles & kept) / len(shingles | kept) > DUPLICATE_JACCARD
+            for kept in kept_shingles
+        ):
+            logger.info("Skipping near-duplicate precedent: %s", chunk["metadata"]["title"])
+            continue
+        selected.append(chunk)
+        kept_shingles.append(shingles)
+        if len(selected) == 5:
+            break
+
+    return selected
+
 def format_context(retrieved_chunks: list) -> str:
-    """Format retrieved chunks efficiently."""
+    """Format retrieved chunks, splitting the token budget by relevance score."""
     if not retrieved_chunks:
         return "No relevant precedents found."
     
+    chunks = select_chunks(retrieved_chunks)
+    weights = [max(c['score'], 0.0) for c in chunks]
+    if not any(weights):
+        weights = [1.0] * len(chunks)
+    total_weight = sum(weights)
+    
     context_parts = ["RELEVANT LEGAL PRECEDENTS:\n"]
+    chars_used = 0
 
-    for i, chunk in enumerate(retrieved_chunks[:5], 1):
-        context_parts.append(f"\n[Precedent {i}] ({chunk['score']:.0%} relevance)")
-        context_parts.append(f"Title: {chunk['metadata']['title']}")
-        context_parts.append(f"Category: {chunk['metadata']['category']}")
-        content = chunk['content']
-        context_parts.append(f"Content: {content}")
-        context_parts.append("")
+    for i, (chunk, weight) in enumerate(zip(chunks, weights), 1):
+        metadata = chunk['metadata']
+        budget = int(MAX_CONTEXT_TOKENS * weight / total_weight) * CHARS_PER_TOKEN
+        content = chunk_content(chunk)
+        if len(content) > budget:
+            content = content[:budget].rstrip() + "..."
+        chars_used += len(content)
+        context_parts.append(
+            f"\n[Precedent {i}] ({chunk['score']:.0%} relevance)\n"
+            f"Title: {metadata['title']}\n"
+            f"Category: {metadata['category']}\n"
+            f"Content: {content}\n"
+        )
     
+    logger.info(
+        "📄 Context: %d/%d chunks, ~%d/%d tokens",
+        len(chunks), len(retrieved_chunks), chars_used // CHARS_PER_TOKEN, MAX_CONTEXT_TOKENS
+    )
     return "\n".join(context_parts)
 
 def format_case_info(info_collected: Dict, user_intent: str) -> str:
@@ -84,14 +256,99 @@ def format_case_info(info_collected: Dict, user_intent: str) -> str:
     if not info_collected:
         return "Limited case information available."
     
-    case_summary = [f"CASE: {user_intent.upper()}\n"]
-    case_summary.append("CLIENT INFORMATION:")
-    
-    for key, value in info_collected.items():
-        case_summary.append(f"• {key.replace('_', ' ').title()}: {value}")
+    case_summary = [f"CASE: {user_intent.upper()}\n", "CLIENT INFORMATION:"]
+    case_summary.extend(
+        f"• {humanize_key(key)}: {value}" for key, value in info_collected.items()
+    )
     
     return "\n".join(case_summary)
 
+# Conversation history carried into the prompt, bounded by tokens rather than turns
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """
+    cl100k_base approximates Llama token counts closely enough for budgeting.
+    None when the BPE file can't be loaded (offline deploy without the tiktoken
+    cache); history is then budgeted by CHARS_PER_TOKEN.
+    """
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("tiktoken encoding unavailable, budgeting history by characters: %s", e)
+        return None
+
+def _truncate_to_tokens(text: str, tokens: int, encoding) -> str:
+    if encoding is None:
+        return text[:tokens * CHARS_PER_TOKEN]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:tokens])
+
+def trim_history(messages: list, budget: int = HISTORY_TOKEN_BUDGET) -> list:
+    """
+    Keep the most recent messages that fit within the token budget. If the
+    latest message alone is over budget it is kept, truncated to the budget.
+    """
+    encoding = _get_encoding()
+    kept = []
+    total = 0
+    for message in reversed(messages):
+        content = str(message.content)
+        if encoding is None:
+            tokens = -(-len(content) // CHARS_PER_TOKEN)
+        else:
+            tokens = len(encoding.encode(content, disallowed_special=()))
+        if total + tokens > budget:
+            if not kept and budget > 0:
+                kept.append(message.model_copy(
+                    update={"content": _truncate_to_tokens(content, budget, encoding), "id": None}
+                ))
+            break
+        kept.append(message)
+        total += tokens
+    kept.reverse()
+    return kept
+
+DISCLAIMER = "\n\n---\n**Disclaimer**: This information is for educational purposes only and does not constitute legal advice. Please consult with a qualified family law attorney for personalized legal guidance."
+_DISCLAIMER_RE = re.compile(r"not a substitute for legal advice", re.IGNORECASE)
+
+# Patterns that indicate the model appended reasoning/JSON after the advice
+CLEANUP_MARKERS = [
+    "Here is the generated reasoning",
+    "Here is the analysis in JSON",
+    "Here is my analysis in JSON",
+    "```json",
+    '{"reasoning_steps"',
+    '{"similarity_score"',
+    "WIN PROBABILITY ESTIMATE:",
+    "CASE STRENGTH FACTORS:"
+]
+
+def clean_response(response_content: str) -> str:
+    """Strip reasoning/JSON the model appended after the legal advice."""
+    for marker in CLEANUP_MARKERS:
+        if marker in response_content:
+            response_content = response_content.split(marker)[0].strip()
+            logger.warning("⚠️ Removed appended content after marker: %s", marker)
+    
+    # Remove any trailing JSON
+    if response_content.rstrip().endswith('}'):
+        # Check if last 500 chars look like JSON
+        tail = response_content[-500:]
+        if tail.count('{') > 2 or tail.count('"') > 10:
+            # Find the last sentence before JSON starts
+            sentences = response_content.split('.')
+            clean_sentences = []
+            for sentence in sentences:
+                if '{' not in sentence and '"reasoning' not in sentence.lower():
+                    clean_sentences.append(sentence)
+                else:
+                    break
+            response_content = '.'.join(clean_sentences) + '.'
+            logger.warning("⚠️ Removed trailing JSON from response")
+    
+    return response_content
+
 def generate_response(state: FamilyLawState) -> Dict:
     """
     Generate legal advice WITHOUT appending reasoning to response text.
@@ -117,81 +374,42 @@ def generate_response(state: FamilyLawState) -> Dict:
     
     # Format context and case information
     legal_context = format_context(retrieved_chunks)
-    case_information = format_case_info(info_collected, user_intent)
-    
-    # Build conversation
-    conversation = [SystemMessage(content=SYSTEM_PROMPT)]
-    
-    if messages:
-        conversation.extend(messages[-4:])
-    
-    # Construct prompt
-    prompt = f"""Provide complete legal advice (experienced lawyer) based on the case information and precedents below.
-
-{case_information}
-
-{legal_context}
-
-CLIENT QUERY: {query}
-
-Provide a COMPLETE, well-structured response with:
-- Internally reason as Issue → Rule (statute/precedent) → Application → Conclusion, but only output the detailed final answer.
-- Prefer authoritative Indian sources and cite succinctly, e.g., (IPC s.498A), (HMA 1955 s.13), (CrPC s.125).
-- If a precise section is uncertain, mention it briefly without guessing.
-- Give concise response to ensure a Flesch Reading Ease score of atleast 55+.
-- Explain legal terms briefly in everyday language when necessary.
-- Give practical guidance wherever possible, focusing on what a person can realistically do.
-
-Use empathetic, professional, simple language. Be thorough - this is important for the client's case.
-
-YOUR COMPLETE RESPONSE:"""
-    
-    conversation.append(HumanMessage(content=prompt))
+    case_information = state.get("case_information") or format_case_info(info_collected, user_intent)
     
     try:
+        # Build conversation. Earlier turns' SystemMessages are dropped from the
+        # history so every request starts with the same single system prefix,
+        # which the TGI prefix cache can reuse across requests.
+        system_message = SystemMessage(content=SYSTEM_PROMPT)
+        history = [m for m in messages if not isinstance(m, SystemMessage)]
+        conversation = [system_message] + trim_history(history)
+        
+        # Construct prompt
+        prompt = RESPONSE_PROMPT.format(
+            case_information=case_information,
+            legal_context=legal_context,
+            query=query
+        )
+        
+        prompt_message = HumanMessage(content=prompt)
+        conversation.append(prompt_message)
+        
         logger.info("Generating response with explainable AI")
         
         # Generate main response
-        response = llm.invoke(conversation)
+        case_query = state.get("root_query") or query
+        max_tokens = response_token_budget(case_query, info_collected, user_intent)
+        response = select_llm(case_query, info_collected, user_intent).invoke(
+            conversation, max_tokens=max_tokens
+        )
         response_content = response.content
         
         # *** CRITICAL CLEANING: Remove any appended reasoning/JSON ***
-        # Check for common patterns that indicate appended content
-        cleanup_markers = [
-            "Here is the generated reasoning",
-            "Here is the analysis in JSON",
-            "Here is my analysis in JSON",
-            "```json",
-            '{"reasoning_steps"',
-            '{"similarity_score"',
-            "WIN PROBABILITY ESTIMATE:",
-            "CASE STRENGTH FACTORS:"
-        ]
-        
-        for marker in cleanup_markers:
-            if marker in response_content:
-                response_content = response_content.split(marker)[0].strip()
-                logger.warning(f"⚠️ Removed appended content after marker: {marker}")
-        
-        # Remove any trailing JSON
-        if response_content.rstrip().endswith('}'):
-            # Check if last 500 chars look like JSON
-            tail = response_content[-500:]
-            if tail.count('{') > 2 or tail.count('"') > 10:
-                # Find the last sentence before JSON starts
-                sentences = response_content.split('.')
-                clean_sentences = []
-                for sentence in sentences:
-                    if '{' not in sentence and '"reasoning' not in sentence.lower():
-                        clean_sentences.append(sentence)
-                    else:
-                        break
-                response_content = '.'.join(clean_sentences) + '.'
-                logger.warning("⚠️ Removed trailing JSON from response")
+        response_content = clean_response(response_content)
         
         # Check if response seems truncated
         if len(response_content) < 500:
-            logger.warning(f"Response seems short: {len(response_content)} chars")
+            logger.warning("Response seems short: %d chars", len(response_content))
         
         # Initialize explainer
         reasoning_steps = []
@@ -222,24 +440,11 @@ YOUR COMPLETE RESPONSE:"""
                 # The reasoning is returned separately in the state
                 # DO NOT modify response_content here
                 
-                logger.info(f"   ✓ Generated {len(reasoning_steps)} reasoning steps (NOT appended)")
-                logger.info(f"   ✓ Generated {len(precedent_explanations)} precedent explanations (NOT appended)")
+                logger.info("   ✓ Generated %d reasoning steps (NOT appended)", len(reasoning_steps))
+                logger.info("   ✓ Generated %d precedent explanations (NOT appended)", len(precedent_explanations))
                 
             except Exception as e:
-                logger.error(f"Failed to generate reasoning: {e}", exc_info=True)
-        
-        # *** CRITICAL CHECK: Ensure nothing was accidentally appended ***
-        # Remove any JSON or reasoning text that might have been added
-        if "reasoning_steps" in response_content or "{" in response_content[-500:]:
-            # Find where the actual legal advice ends (before any JSON)
-            if "Here is the generated reasoning" in response_content:
-                response_content = response_content.split("Here is the generated reasoning")[0].strip()
-            elif "```json" in response_content:
-                response_content = response_content.split("```json")[0].strip()
-            elif '{"reasoning_steps"' in response_content:
-                response_content = response_content.split('{"reasoning_steps"')[0].strip()
-            
-            logger.warning("⚠️ Removed accidentally appended reasoning from response_content")
+                logger.error("Failed to generate reasoning: %s", e, exc_info=True)
         
         # Add outcome prediction if requested (also NOT appended)
         prediction_data = None
@@ -264,10 +469,10 @@ YOUR COMPLETE RESPONSE:"""
         #         logger.error(f"Prediction failed: {e}")
         
         # Add disclaimer to response
-        if "not a substitute for legal advice" not in response_content.lower():
-            response_content += "\n\n---\n**Disclaimer**: This information is for educational purposes only and does not constitute legal advice. Please consult with a qualified family law attorney for personalized legal guidance."
+        if not _DISCLAIMER_RE.search(response_content):
+            response_content += DISCLAIMER
         
-        logger.info(f"Generated response: {len(response_content)} characters")
+        logger.info("Generated response: %d characters", len(response_content))
         
         # Convert reasoning steps to serializable format
         reasoning_steps_dict = []
@@ -298,14 +503,16 @@ YOUR COMPLETE RESPONSE:"""
         # Return clean response with reasoning/citations separate
         return {
             "response": response_content,  # CLEAN - No reasoning appended
-            "messages": conversation + [response],
+            # Full history, not the trimmed prompt copy: add_messages merges by
+            # id, so a truncated message would overwrite the stored one
+            "messages": [system_message, *history, prompt_message, response],
             "reasoning_steps": reasoning_steps_dict,  # Separate
             "precedent_explanations": precedent_explanations_dict,  # Separate
             "prediction": prediction_data  # Separate
         }
     
     except Exception as e:
-        logger.error(f"Error generating response: {str(e)}")
+        logger.error("Error generating response: %s", e)
         return {
             "response": f"I apologize, but I encountered an error while generating advice. Please try rephrasing your question or contact support. Error: {str(e)}",
             "messages": messages,
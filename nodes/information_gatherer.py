@@ -10,42 +10,198 @@ Key fixes:
 from langchain_core.messages import HumanMessage, SystemMessage
 from typing import Dict, List
 import os
+import re
 import json
+import asyncio
+import hashlib
 import logging
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+import threading
+from collections import OrderedDict, deque
+from functools import cached_property
+from llm_client import get_chat_model, llm_semaphore
+from llm_utils import parse_llm_json, humanize_key, PromptTemplate
 
 logger = logging.getLogger(__name__)
 
+# Gender keywords; pronouns and "man" are whole-word so "the"/"many" don't match
+_FEMALE_RE = re.compile(r"wife|woman|female|girl|\bshe\b|\bher\b", re.IGNORECASE)
+_MALE_RE = re.compile(r"husband|\bman\b|male|boy|\bhe\b|\bhim\b", re.IGNORECASE)
+
+# Regex fast path for common targets: (target-name pattern, answer pattern).
+# Only used for short replies, where the match is the whole answer.
+QUICK_EXTRACT_MAX_CHARS = 80
+_MONTHS = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*"
+EXTRACTORS = [
+    (
+        re.compile(r"(marriage|wedding|married).*(date|year|when)|year_of_marriage", re.IGNORECASE),
+        re.compile(rf"\b(?:\d{{1,2}}(?:st|nd|rd|th)?\s+)?(?:{_MONTHS}\.?,?\s+)?(?:19|20)\d{{2}}\b", re.IGNORECASE),
+    ),
+    (
+        re.compile(r"(num|number|count).*(child|kid)|(child|kid).*(num|number|count)", re.IGNORECASE),
+        re.compile(r"\b(?:\d+|no|one|two|three|four|five|six)\s+(?:kids?|child(?:ren)?|sons?|daughters?)\b", re.IGNORECASE),
+    ),
+]
+_YES_NO_TARGET_RE = re.compile(r"^(has|have|is|are|any|was|were|did)_", re.IGNORECASE)
+_YES_NO_ANSWER_RE = re.compile(r"^\s*(yes|yeah|yep|no|nope|not yet)\b[\s.!]*$", re.IGNORECASE)
+
+# Per-call generation limits: answers are a few words, questions one sentence.
+# With LLM_GRAMMAR_DECODING=true, JSON replies are also schema-constrained
+# (TGI grammar support; not every HF serverless provider accepts it).
+LLM_GRAMMAR_DECODING = os.getenv("LLM_GRAMMAR_DECODING", "false").lower() == "true"
+
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {"extracted_answer": {"type": "string"}},
+    "required": ["extracted_answer"]
+}
+COMBINED_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "extracted_answer": {"type": "string"},
+        "next_question": {"type": "string"}
+    },
+    "required": ["extracted_answer", "next_question"]
+}
+
+# JSON replies are flat objects, so the server can stop at the first "}"
+# instead of decoding trailing filler; _parse_reply restores the brace.
+QUESTION_CALL_KWARGS = {"max_tokens": 96}
+EXTRACTION_CALL_KWARGS = {"max_tokens": 192, "stop": ["}"]}
+COMBINED_CALL_KWARGS = {"max_tokens": 192, "stop": ["}"]}
+if LLM_GRAMMAR_DECODING:
+    EXTRACTION_CALL_KWARGS["response_format"] = {"type": "json", "value": EXTRACTION_SCHEMA}
+    COMBINED_CALL_KWARGS["response_format"] = {"type": "json", "value": COMBINED_SCHEMA}
+
+_QUESTION_MARKER_RE = re.compile(r"^\s*(?:YOUR )?QUESTION:", re.IGNORECASE | re.MULTILINE)
+_EXTRACTED_ANSWER_RE = re.compile(r'"extracted_answer":\s*"([^"]+)"')
+
+# Optional small model tried first for extraction; its reply is kept if it parses
+# with an extracted_answer (NOT_PROVIDED included), otherwise the call escalates
+# to LLM_MODEL.
+SMALL_LLM_MODEL = os.getenv("SMALL_LLM_MODEL")
+
+
+def _parse_reply(response_text: str):
+    """parse_llm_json for replies cut at the "}" stop sequence (which may be omitted)."""
+    return parse_llm_json(response_text) or parse_llm_json(response_text + "}")
+
+
+def _is_valid_reply(response_text: str) -> bool:
+    """True if the reply is JSON with a non-empty extracted_answer (NOT_PROVIDED is valid)."""
+    data = _parse_reply(response_text)
+    if not isinstance(data, dict):
+        return False
+    extracted = data.get("extracted_answer")
+    return isinstance(extracted, str) and bool(extracted.strip())
+
+# Exact-match cache of LLM replies, shared by all InformationGatherer instances.
+# Short answers ("yes", "female", "2020") to the same question recur constantly.
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "4096"))
+_prompt_cache = OrderedDict()
+_prompt_cache_lock = threading.Lock()
+
+
+def _prompt_key(conversation: List, model: str = "", call_kwargs: Dict = None) -> str:
+    """Stable digest of a conversation's message contents (per model and call kwargs)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    # max_tokens / stop / response_format change the reply for the same prompt
+    digest.update(json.dumps(call_kwargs or {}, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    for message in conversation:
+        digest.update(message.content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _cache_get(key: str):
+    with _prompt_cache_lock:
+        content = _prompt_cache.get(key)
+        if content is not None:
+            _prompt_cache.move_to_end(key)
+        return content
+
+
+def _cache_put(key: str, content: str) -> None:
+    with _prompt_cache_lock:
+        _prompt_cache[key] = content
+        _prompt_cache.move_to_end(key)
+        while len(_prompt_cache) > PROMPT_CACHE_SIZE:
+            _prompt_cache.popitem(last=False)
+
+
+# Optional semantic cache for generated questions. Entries are bucketed by the
+# exact target; within a bucket a question is reused when the consultation
+# (intent, query, collected info) embeds within SEMANTIC_CACHE_THRESHOLD cosine.
+SEMANTIC_QUESTION_CACHE = os.getenv("SEMANTIC_QUESTION_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))  # entries per target
+
+_embedder = None
+_semantic_cache = {}  # target -> deque of (unit vector, question)
+_semantic_cache_lock = threading.Lock()
+
+
+def _embed(text: str):
+    """Unit-normalised embedding; the model is loaded on first use."""
+    global _embedder
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
+        _embedder = SentenceTransformer(SEMANTIC_CACHE_MODEL)
+    return _embedder.encode(text, normalize_embeddings=True)
+
+
+def _semantic_get(target: str, vector):
+    with _semantic_cache_lock:
+        entries = list(_semantic_cache.get(target, ()))
+    best_score, best_question = SEMANTIC_CACHE_THRESHOLD, None
+    for cached_vector, question in entries:
+        score = float(cached_vector @ vector)
+        if score >= best_score:
+            best_score, best_question = score, question
+    return best_question
+
+
+def _semantic_put(target: str, vector, question: str) -> None:
+    with _semantic_cache_lock:
+        entries = _semantic_cache.setdefault(target, deque(maxlen=SEMANTIC_CACHE_SIZE))
+        entries.append((vector, question))
+
 
 class InformationGatherer:
     """
     Gathers information iteratively through targeted questions.
     """
 
-    QUESTION_GENERATION_PROMPT = """You are a compassionate Indian FAMILY LAW attorney conducting a client consultation.
+    # Prompts keep their static instructions first and the per-call fields at the
+    # end, so consecutive requests share a long identical prefix that the
+    # endpoint's prefix cache can reuse.
+    SYSTEM_PROMPT = (
+        "You are a compassionate Indian FAMILY LAW attorney conducting a client consultation. "
+        "Follow the task instructions exactly."
+    )
 
-SITUATION:
-- User's Query: {root_query}
-- User Intent: {user_intent}
-- Information already collected: {info_collected}
-- Next information needed: {current_target}
-
-YOUR TASK:
-Ask ONE clear, empathetic question to gather: {current_target}
+    QUESTION_GENERATION_PROMPT = """YOUR TASK:
+Ask ONE clear, empathetic question to gather the NEXT INFORMATION NEEDED listed below.
 
 CRITICAL RULES:
 1. If user's gender is already known, DO NOT ask about it again
-2. Ask ONLY about {current_target} that support the case - be specific and direct
+2. Ask ONLY about the next information needed that supports the case - be specific and direct
 3. Use simple, clear language
 4. Reference previously collected information naturally
 
+=== CONSULTATION ===
+- User's Query: {root_query}
+- User Intent: {user_intent}
+- Information already collected: {info_collected}
+- NEXT INFORMATION NEEDED: {current_target}
+
 YOUR QUESTION:"""
 
     ANSWER_EXTRACTION_PROMPT = """Extract ONLY the direct answer to the question from the user's response.
 
-QUESTION ASKED: {last_question}
-USER'S RESPONSE: {user_response}
-
 EXTRACTION RULES:
 1. If the user directly answers the question, extract that answer
 2. Be concise - extract only the relevant part
@@ -65,208 +221,557 @@ Response: "We got married in 2020" → Extract: "2020"
 
 Response: "I don't remember" → Extract: "NOT_PROVIDED"
 
-NOW EXTRACT:
-Response (JSON only, no other text):
+Response format (JSON only, no other text):
 {{
-    "extracted_answer": "the comprehensive generated answer based on user responseOR NOT_PROVIDED"
-}}"""
+    "extracted_answer": "the comprehensive generated answer based on user response OR NOT_PROVIDED"
+}}
+
+=== NOW EXTRACT ===
+QUESTION ASKED: {last_question}
+USER'S RESPONSE: {user_response}"""
+    
+    COMBINED_PROMPT = """TASK 1 - Extract ONLY the direct answer to the QUESTION ASKED from the USER'S RESPONSE.
+- Be concise - extract only the relevant part
+- If user says "yes", "no", "I am", etc., extract the actual answer (e.g., "yes" → "female")
+- If user provides no relevant answer, use "NOT_PROVIDED"
+- DO NOT add extra context or interpretations
+
+TASK 2 - Ask ONE clear, empathetic question to gather the NEXT INFORMATION NEEDED.
+- If user's gender is already known, DO NOT ask about it again
+- Use simple, clear language
+- Reference previously collected information naturally
+
+Response format (JSON only, no other text):
+{{
+    "extracted_answer": "the answer OR NOT_PROVIDED",
+    "next_question": "your question"
+}}
+
+=== CONSULTATION ===
+- User's Query: {root_query}
+- User Intent: {user_intent}
+- Information already collected: {info_collected}
+- QUESTION ASKED: {last_question}
+- USER'S RESPONSE: {user_response}
+- NEXT INFORMATION NEEDED: {next_target}"""
+    
+    # Parsed once; .format() only joins the literal spans with the field values
+    _QUESTION_TEMPLATE = PromptTemplate(QUESTION_GENERATION_PROMPT)
+    _EXTRACTION_TEMPLATE = PromptTemplate(ANSWER_EXTRACTION_PROMPT)
+    _COMBINED_TEMPLATE = PromptTemplate(COMBINED_PROMPT)
     
     def __init__(self, huggingface_api_key: str = None):
-        """Initialize the InformationGatherer with LLM."""
-        api_key = huggingface_api_key or os.getenv("HUGGINGFACE_API_KEY")
-        
-        self.llm = ChatHuggingFace(
-            llm=HuggingFaceEndpoint(
-                repo_id=os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct"),
-                huggingfacehub_api_token=api_key,
-                task="text-generation",
-                max_new_tokens=256,
-                temperature=0.1,  # Lower temperature for more consistent extraction
-            )
+        """Initialize the InformationGatherer; LLM clients are created on first use."""
+        self.huggingface_api_key = huggingface_api_key
+    
+    @cached_property
+    def llm(self):
+        return get_chat_model(
+            max_new_tokens=256,
+            temperature=0.1,  # Lower temperature for more consistent extraction
+            task="text-generation",
+            api_key=self.huggingface_api_key
+        )
+    
+    @cached_property
+    def small_llm(self):
+        """Optional cascade model (None unless SMALL_LLM_MODEL is set)."""
+        if not SMALL_LLM_MODEL:
+            return None
+        return get_chat_model(
+            max_new_tokens=256,
+            temperature=0.1,
+            task="text-generation",
+            api_key=self.huggingface_api_key,
+            repo_id=SMALL_LLM_MODEL
         )
     
+    def _invoke(self, conversation: List, llm=None, **call_kwargs) -> str:
+        """Call the LLM (default: self.llm), answering repeated prompts from the cache."""
+        llm = llm or self.llm
+        key = _prompt_key(conversation, llm.llm.repo_id or "", call_kwargs)
+        content = _cache_get(key)
+        if content is None:
+            content = llm.invoke(conversation, **call_kwargs).content
+            _cache_put(key, content)
+        else:
+            logger.info("⚡ Prompt cache hit")
+        return content
+    
+    async def _ainvoke(self, conversation: List, llm=None, **call_kwargs) -> str:
+        """Async variant of _invoke, bounded by the shared LLM semaphore."""
+        llm = llm or self.llm
+        key = _prompt_key(conversation, llm.llm.repo_id or "", call_kwargs)
+        content = _cache_get(key)
+        if content is None:
+            async with llm_semaphore():
+                content = (await llm.ainvoke(conversation, **call_kwargs)).content
+            _cache_put(key, content)
+        else:
+            logger.info("⚡ Prompt cache hit")
+        return content
+    
+    def _cascade_invoke(self, conversation: List, **call_kwargs) -> str:
+        """Try the small model first; escalate to self.llm if its reply doesn't parse."""
+        if self.small_llm is not None:
+            try:
+                content = self._invoke(conversation, llm=self.small_llm, **call_kwargs)
+                if _is_valid_reply(content):
+                    return content
+                logger.info("⤴️ Small model reply unparseable, escalating")
+            except Exception as e:
+                logger.warning("Small model failed, escalating: %s", e)
+        return self._invoke(conversation, **call_kwargs)
+    
+    async def _acascade_invoke(self, conversation: List, **call_kwargs) -> str:
+        """Async variant of _cascade_invoke."""
+        if self.small_llm is not None:
+            try:
+                content = await self._ainvoke(conversation, llm=self.small_llm, **call_kwargs)
+                if _is_valid_reply(content):
+                    return content
+                logger.info("⤴️ Small model reply unparseable, escalating")
+            except Exception as e:
+                logger.warning("Small model failed, escalating: %s", e)
+        return await self._ainvoke(conversation, **call_kwargs)
+    
     def gather_next_information(self, state: Dict) -> Dict:
         """
         Main logic: Extract answer from previous response OR ask next question.
         """
+        step = self._start_step(state)
+        
+        # STEP 1: Extract answer from previous response if applicable
+        if step["pending_answer"]:
+            extracted, step["planned_question"] = self._extract_and_ask(**step["pending_answer"])
+            self._store_answer(step, extracted)
+        
+        # STEP 2: Check if done
+        next_target = self._select_next_target(step)
+        if next_target is None:
+            return self._completed_result(step)
+        
+        # STEP 3: Generate next question
+        next_question = self._planned_question_for(step, next_target)
+        if next_question is None:
+            logger.info("Generating question for: %s", next_target)
+            next_question = self._generate_question(**self._question_args(step, next_target))
+        
+        return self._question_result(step, next_target, next_question)
+    
+    async def agather_next_information(self, state: Dict) -> Dict:
+        """
+        Async variant of gather_next_information: LLM calls are awaited so the
+        event loop can serve other sessions while the endpoint responds.
+        """
+        step = self._start_step(state)
+        
+        if step["pending_answer"]:
+            extracted, step["planned_question"] = await self._aextract_and_ask(**step["pending_answer"])
+            self._store_answer(step, extracted)
+        
+        next_target = self._select_next_target(step)
+        if next_target is None:
+            return self._completed_result(step)
+        
+        next_question = self._planned_question_for(step, next_target)
+        if next_question is None:
+            logger.info("Generating question for: %s", next_target)
+            next_question = await self._agenerate_question(**self._question_args(step, next_target))
+        
+        return self._question_result(step, next_target, next_question)
+    
+    def _start_step(self, state: Dict) -> Dict:
+        """
+        Collect the gathering state and work out which answer (if any) must be extracted.
+        
+        info_collected / info_needed_list are the caller's objects; they are only
+        copied at the point of mutation (see _store_answer, _select_next_target).
+        """
         query = state["query"]
-        root_query = state.get("root_query", query)
         messages = state.get("messages", [])
-        info_collected = dict(state.get("info_collected", {}))
-        info_needed_list = list(state.get("info_needed_list", []))
-        user_intent = state.get("user_intent", "legal advice")
-        gathering_step = state.get("gathering_step", 0)
+        step = {
+            "root_query": state.get("root_query", query),
+            "info_collected": state.get("info_collected", {}),
+            "info_needed_list": state.get("info_needed_list", []),
+            "user_intent": state.get("user_intent", "legal advice"),
+            "gathering_step": state.get("gathering_step", 0),
+            "pending_answer": None,
+            "planned_target": None,
+            "planned_question": None
+        }
+        info_collected = step["info_collected"]
+        info_needed_list = step["info_needed_list"]
+        gathering_step = step["gathering_step"]
         
-        logger.info(f"=== Gathering Step {gathering_step} ===")
-        logger.info(f"Info needed: {info_needed_list}")
-        logger.info(f"Info collected: {list(info_collected.keys())}")
+        logger.info("=== Gathering Step %d ===", gathering_step)
+        logger.info("Info needed: %s", info_needed_list)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Info collected: %s", list(info_collected.keys()))
+        
+        if gathering_step == 0 and state.get("follow_up_question"):
+            # Question the analyzer drafted for its first needed item
+            step["planned_target"] = state.get("current_question_target")
+            step["planned_question"] = state["follow_up_question"]
         
-        # STEP 1: Extract answer from previous response if applicable
         if gathering_step > 0 and info_needed_list:
             current_target = state.get("current_question_target") or info_needed_list[0]
             
-            # Get user's response
-            user_messages = [m for m in messages if m.__class__.__name__ == "HumanMessage"]
+            # Get user's response (the gathering_step-th user message)
+            last_user_msg = self._nth_user_message(messages, gathering_step)
             
-            if len(user_messages) > gathering_step:
-                last_user_msg = user_messages[gathering_step]
+            if last_user_msg is not None:
                 last_question = state.get("follow_up_question", "")
                 
-                logger.info(f"Extracting answer for: {current_target}")
-                logger.info(f"Question was: {last_question}")
-                logger.info(f"User response: {last_user_msg.content[:100]}...")
+                logger.info("Extracting answer for: %s", current_target)
+                logger.info("Question was: %s", last_question)
+                logger.info("User response: %.100s...", last_user_msg.content)
                 
-                # Extract the information
-                extracted = self._extract_information(
-                    last_question=last_question,
-                    user_response=last_user_msg.content,
-                    info_target=current_target
+                # Target we will ask about next if this answer is extracted
+                step["planned_target"] = next(
+                    (t for t in info_needed_list if t != current_target and t not in info_collected),
+                    None
                 )
                 
-                logger.info(f"Extracted: {extracted}")
-                
-                # Store the answer
-                if extracted and extracted != "NOT_PROVIDED":
-                    # Special handling for gender
-                    if current_target == "user_gender":
-                        extracted = self._normalize_gender(extracted)
-                        info_collected["user_gender"] = extracted
-                        logger.info(f"✓ Gender identified and stored: {extracted}")
-                    else:
-                        info_collected[current_target] = extracted
-                        logger.info(f"✓ Stored: {current_target} = {extracted}")
-                    
-                    # Remove from needed list
-                    if current_target in info_needed_list:
-                        info_needed_list.remove(current_target)
-                else:
-                    # Store in additional_info if not the target answer
-                    additional = info_collected.get("additional_info", "")
-                    info_collected["additional_info"] = f"{additional}\n{last_user_msg.content}".strip()
-                    logger.warning(f"Could not extract {current_target}, stored in additional_info")
-        
-        # STEP 2: Check if done
-        if not info_needed_list:
-            logger.info("✓ All information collected!")
-            return {
-                "needs_more_info": False,
-                "info_collected": info_collected,
-                "info_needed_list": [],
-                "gathering_step": gathering_step,
-                "current_question_target": None
-            }
-        
-        # STEP 3: Generate next question
-        next_target = info_needed_list[0]
-        
-        # Skip if gender already collected
-        if next_target == "user_gender" and "user_gender" in info_collected:
-            logger.info("Gender already known, skipping...")
-            info_needed_list.remove("user_gender")
-            if not info_needed_list:
-                return {
-                    "needs_more_info": False,
+                step["pending_answer"] = {
+                    "last_question": last_question,
+                    "user_response": last_user_msg.content,
+                    "info_target": current_target,
+                    "root_query": step["root_query"],
+                    "user_intent": step["user_intent"],
                     "info_collected": info_collected,
-                    "info_needed_list": [],
-                    "gathering_step": gathering_step,
-                    "current_question_target": None
+                    "next_target": step["planned_target"]
                 }
-            next_target = info_needed_list[0]
         
-        logger.info(f"Generating question for: {next_target}")
+        return step
+    
+    @staticmethod
+    def _nth_user_message(messages: List, n: int):
+        """Return the n-th (0-based) HumanMessage in one pass, or None if there are fewer."""
+        for message in messages:
+            if isinstance(message, HumanMessage):
+                if n == 0:
+                    return message
+                n -= 1
+        return None
+    
+    def _store_answer(self, step: Dict, extracted: str) -> None:
+        """Record an extracted answer, or keep the raw reply as additional_info."""
+        pending = step["pending_answer"]
+        current_target = pending["info_target"]
+        info_collected = step["info_collected"]
+        info_needed_list = step["info_needed_list"]
         
-        next_question = self._generate_question(
-            root_query=root_query,
-            user_intent=user_intent,
-            info_collected=info_collected,
-            current_target=next_target,
-            all_remaining=info_needed_list
-        )
+        logger.info("Extracted: %s", extracted)
+        
+        # Store the answer
+        if extracted and extracted != "NOT_PROVIDED":
+            # Special handling for gender
+            if current_target == "user_gender":
+                extracted = self._normalize_gender(extracted)
+                step["info_collected"] = {**info_collected, "user_gender": extracted}
+                self._extend_info_text(info_collected, step["info_collected"], "user_gender")
+                logger.info("✓ Gender identified and stored: %s", extracted)
+            else:
+                step["info_collected"] = {**info_collected, current_target: extracted}
+                self._extend_info_text(info_collected, step["info_collected"], current_target)
+                logger.info("✓ Stored: %s = %s", current_target, extracted)
+            
+            # Remove from needed list; the target is normally the head, so slice it off
+            rest = info_needed_list[1:]
+            if info_needed_list[:1] == [current_target] and current_target not in rest:
+                step["info_needed_list"] = rest
+            else:
+                step["info_needed_list"] = [t for t in info_needed_list if t != current_target]
+        else:
+            # Store in additional_info if not the target answer
+            additional = info_collected.get("additional_info", "")
+            step["info_collected"] = {
+                **info_collected,
+                "additional_info": f"{additional}\n{pending['user_response']}".strip()
+            }
+            logger.warning("Could not extract %s, stored in additional_info", current_target)
+    
+    def _select_next_target(self, step: Dict):
+        """Next item to ask about, skipping duplicates and anything already collected; None when done."""
+        info_needed_list = step["info_needed_list"]
+        info_collected = step["info_collected"]
         
+        pending = [t for t in dict.fromkeys(info_needed_list) if t not in info_collected]
+        if len(pending) != len(info_needed_list):
+            logger.info("Already collected, skipping: %s", [t for t in info_needed_list if t in info_collected])
+            step["info_needed_list"] = pending
+        
+        if not pending:
+            logger.info("✓ All information collected!")
+            return None
+        
+        return pending[0]
+    
+    def _planned_question_for(self, step: Dict, next_target: str):
+        """Question drafted during extraction (or analysis), if it was drafted for this target."""
+        if step["planned_question"] and next_target == step["planned_target"]:
+            logger.info("Using question drafted earlier for: %s", next_target)
+            return step["planned_question"]
+        return None
+    
+    def _question_args(self, step: Dict, next_target: str) -> Dict:
+        return {
+            "root_query": step["root_query"],
+            "user_intent": step["user_intent"],
+            "info_collected": step["info_collected"],
+            "current_target": next_target,
+            "all_remaining": step["info_needed_list"]
+        }
+    
+    def _completed_result(self, step: Dict) -> Dict:
+        return {
+            "needs_more_info": False,
+            "info_collected": step["info_collected"],
+            "info_needed_list": [],
+            "gathering_step": step["gathering_step"],
+            "current_question_target": None
+        }
+    
+    def _question_result(self, step: Dict, next_target: str, next_question: str) -> Dict:
         return {
             "needs_more_info": True,
             "follow_up_question": next_question,
-            "info_collected": info_collected,
-            "info_needed_list": info_needed_list,
-            "gathering_step": gathering_step + 1,
+            "info_collected": step["info_collected"],
+            "info_needed_list": step["info_needed_list"],
+            "gathering_step": step["gathering_step"] + 1,
             "current_question_target": next_target
         }
     
     def _normalize_gender(self, text: str) -> str:
         """Normalize gender responses to consistent values."""
-        text_lower = text.lower().strip()
-        
-        # Female indicators
-        if any(word in text_lower for word in ["wife", "woman", "female", "girl", "she", "her"]):
+        # Female indicators (checked first: "female"/"woman" contain the male words)
+        if _FEMALE_RE.search(text):
             return "female"
         
         # Male indicators
-        if any(word in text_lower for word in ["husband", "man", "male", "boy", "he", "him"]):
+        if _MALE_RE.search(text):
             return "male"
         
         # Direct answers
-        if "f" == text_lower[0]:
+        text_lower = text.lower().strip()
+        if text_lower.startswith("f"):
             return "female"
-        if "m" == text_lower[0]:
+        if text_lower.startswith("m"):
             return "male"
         
         return text
     
-    def _generate_question(
+    def _question_messages(
         self,
         root_query: str,
         user_intent: str,
         info_collected: Dict,
-        current_target: str,
-        all_remaining: List[str]
-    ) -> str:
-        """Generate a focused question."""
-        
+        current_target: str
+    ) -> List:
+        """Build the question-generation conversation."""
         collected_str = self._format_info_collected(info_collected)
         
-        prompt = self.QUESTION_GENERATION_PROMPT.format(
+        prompt = self._QUESTION_TEMPLATE.format(
             root_query=root_query,
-            user_intent=user_intent.replace("_", " ").title(),
+            user_intent=humanize_key(user_intent),
             info_collected=collected_str or "None yet",
-            current_target=current_target.replace("_", " ").title()
+            current_target=humanize_key(current_target)
         )
         
+        return [
+            SystemMessage(content=self.SYSTEM_PROMPT),
+            HumanMessage(content=prompt)
+        ]
+    
+    def _semantic_lookup(
+        self,
+        root_query: str,
+        user_intent: str,
+        info_collected: Dict,
+        current_target: str
+    ) -> tuple:
+        """Return (cached question or None, consultation vector for storing a new one)."""
+        vector = _embed(
+            f"{user_intent}\n{root_query}\n{self._format_info_collected(info_collected)}"
+        )
+        question = _semantic_get(current_target, vector)
+        if question:
+            logger.info("⚡ Semantic question cache hit for: %s", current_target)
+        return question, vector
+    
+    @staticmethod
+    def _clean_question(text: str) -> str:
+        """Keep the text after the last "YOUR QUESTION:"/"Question:" marker, unquoted."""
+        return _QUESTION_MARKER_RE.split(text)[-1].strip().strip('"\'')
+    
+    def _generate_question(
+        self,
+        root_query: str,
+        user_intent: str,
+        info_collected: Dict,
+        current_target: str,
+        all_remaining: List[str]
+    ) -> str:
+        """Generate a focused question."""
         try:
-            conversation = [
-                SystemMessage(content="You are an empathetic attorney. Ask ONE clear question."),
-                HumanMessage(content=prompt)
-            ]
-            
-            response = self.llm.invoke(conversation)
-            question = response.content.strip()
-            
-            # Clean response
-            if "YOUR QUESTION:" in question:
-                question = question.split("YOUR QUESTION:")[-1].strip()
-            question = question.strip('"\'')
+            vector = None
+            if SEMANTIC_QUESTION_CACHE:
+                question, vector = self._semantic_lookup(root_query, user_intent, info_collected, current_target)
+                if question:
+                    return question
             
+            conversation = self._question_messages(root_query, user_intent, info_collected, current_target)
+            question = self._clean_question(self._invoke(conversation, **QUESTION_CALL_KWARGS))
+            if vector is not None:
+                _semantic_put(current_target, vector, question)
             return question
         
         except Exception as e:
-            logger.error(f"Error generating question: {e}")
+            logger.error("Error generating question: %s", e)
             return f"Could you please provide information about your {current_target.replace('_', ' ')}?"
     
-    def _extract_information(
-        self, 
-        last_question: str, 
-        user_response: str, 
-        info_target: str
+    async def _agenerate_question(
+        self,
+        root_query: str,
+        user_intent: str,
+        info_collected: Dict,
+        current_target: str,
+        all_remaining: List[str]
     ) -> str:
-        """Extract specific information with improved logic."""
+        """Async variant of _generate_question."""
+        try:
+            vector = None
+            if SEMANTIC_QUESTION_CACHE:
+                # Embedding is CPU-bound; keep it off the event loop
+                question, vector = await asyncio.to_thread(
+                    self._semantic_lookup, root_query, user_intent, info_collected, current_target
+                )
+                if question:
+                    return question
+            
+            conversation = self._question_messages(root_query, user_intent, info_collected, current_target)
+            question = self._clean_question(await self._ainvoke(conversation, **QUESTION_CALL_KWARGS))
+            if vector is not None:
+                _semantic_put(current_target, vector, question)
+            return question
+        
+        except Exception as e:
+            logger.error("Error generating question: %s", e)
+            return f"Could you please provide information about your {current_target.replace('_', ' ')}?"
+    
+    def _combined_messages(
+        self,
+        last_question: str,
+        user_response: str,
+        root_query: str,
+        user_intent: str,
+        info_collected: Dict,
+        next_target: str
+    ) -> List:
+        """Build the fused extract-and-ask conversation."""
+        prompt = self._COMBINED_TEMPLATE.format(
+            root_query=root_query,
+            user_intent=humanize_key(user_intent),
+            info_collected=self._format_info_collected(info_collected),
+            last_question=last_question,
+            user_response=user_response,
+            next_target=humanize_key(next_target)
+        )
+        
+        return [
+            SystemMessage(content=self.SYSTEM_PROMPT),
+            HumanMessage(content=prompt)
+        ]
+    
+    def _parse_combined(self, response_text: str, info_target: str) -> tuple:
+        """Parse the fused response into (extracted_answer, next_question)."""
+        data = _parse_reply(response_text)
+        if data is None:
+            raise ValueError("No JSON object in combined response")
+        
+        extracted = str(data.get("extracted_answer") or "NOT_PROVIDED").strip()
+        if "gender" in info_target.lower() and extracted != "NOT_PROVIDED":
+            extracted = self._normalize_gender(extracted)
+        
+        next_question = str(data.get("next_question") or "").strip().strip('"\'') or None
+        return extracted, next_question
+    
+    def _extract_and_ask(
+        self,
+        last_question: str,
+        user_response: str,
+        info_target: str,
+        root_query: str,
+        user_intent: str,
+        info_collected: Dict,
+        next_target: str = None
+    ) -> tuple:
+        """
+        Extract the answer and draft the next question in a single LLM call.
+        
+        Returns (extracted_answer, next_question); next_question is None when it
+        could not be drafted here and must be generated separately.
+        """
+        quick = self._quick_extract(last_question, user_response, info_target)
+        if quick:
+            return quick, None
+        
+        if not next_target:
+            return self._extract_information(last_question, user_response, info_target), None
+        
+        try:
+            conversation = self._combined_messages(
+                last_question, user_response, root_query, user_intent, info_collected, next_target
+            )
+            return self._parse_combined(self._cascade_invoke(conversation, **COMBINED_CALL_KWARGS), info_target)
         
-        # Quick pattern matching for common answers
+        except Exception as e:
+            logger.warning("Combined extraction failed, falling back to separate calls: %s", e)
+            return self._extract_information(last_question, user_response, info_target), None
+    
+    async def _aextract_and_ask(
+        self,
+        last_question: str,
+        user_response: str,
+        info_target: str,
+        root_query: str,
+        user_intent: str,
+        info_collected: Dict,
+        next_target: str = None
+    ) -> tuple:
+        """Async variant of _extract_and_ask."""
+        quick = self._quick_extract(last_question, user_response, info_target)
+        if quick:
+            return quick, None
+        
+        if not next_target:
+            return await self._aextract_information(last_question, user_response, info_target), None
+        
+        try:
+            conversation = self._combined_messages(
+                last_question, user_response, root_query, user_intent, info_collected, next_target
+            )
+            return self._parse_combined(await self._acascade_invoke(conversation, **COMBINED_CALL_KWARGS), info_target)
+        
+        except Exception as e:
+            logger.warning("Combined extraction failed, falling back to separate calls: %s", e)
+            # Independent calls: overlap them instead of paying two round-trips
+            extracted, next_question = await asyncio.gather(
+                self._aextract_information(last_question, user_response, info_target),
+                self._agenerate_question(root_query, user_intent, info_collected, next_target, [])
+            )
+            return extracted, next_question
+    
+    def _quick_extract(self, last_question: str, user_response: str, info_target: str) -> str:
+        """Pattern-match common short answers without calling the LLM."""
         user_lower = user_response.lower().strip()
         
         # Gender-specific quick extraction
         if "gender" in info_target.lower():
-            if any(word in user_lower for word in ["wife", "woman", "female", "girl", "she"]):
+            if _FEMALE_RE.search(user_response):
                 return "female"
-            if any(word in user_lower for word in ["husband", "man", "male", "boy", "he"]):
+            if _MALE_RE.search(user_response):
                 return "male"
         
         # Simple yes/no to actual values
@@ -277,56 +782,122 @@ Response (JSON only, no other text):
             if "female" in last_question.lower():
                 return "female"
         
-        # Use LLM for complex extraction
-        prompt = self.ANSWER_EXTRACTION_PROMPT.format(
+        if len(user_lower) > QUICK_EXTRACT_MAX_CHARS:
+            return None
+        
+        # Dates, child counts, etc.
+        for target_re, answer_re in EXTRACTORS:
+            if target_re.search(info_target):
+                match = answer_re.search(user_response)
+                if match:
+                    return match.group(0)
+        
+        # Bare yes/no for has_/is_/any_ style targets
+        if _YES_NO_TARGET_RE.search(info_target):
+            match = _YES_NO_ANSWER_RE.match(user_lower)
+            if match:
+                return "no" if match.group(1).startswith(("no", "not")) else "yes"
+        
+        return None
+    
+    def _extraction_messages(self, last_question: str, user_response: str) -> List:
+        prompt = self._EXTRACTION_TEMPLATE.format(
             last_question=last_question,
             user_response=user_response
         )
+        return [
+            SystemMessage(content=self.SYSTEM_PROMPT),
+            HumanMessage(content=prompt)
+        ]
+    
+    def _parse_extraction(self, response_text: str, user_response: str, info_target: str) -> str:
+        """Read extracted_answer from the model output, tolerating malformed JSON."""
+        data = _parse_reply(response_text)
+        if data is not None:
+            extracted = data.get("extracted_answer", "NOT_PROVIDED")
+        else:
+            # Fallback: look for the pattern
+            match = _EXTRACTED_ANSWER_RE.search(response_text)
+            extracted = match.group(1) if match else user_response.strip()
+        
+        # Normalize if it's a gender answer
+        if "gender" in info_target.lower() and extracted != "NOT_PROVIDED":
+            extracted = self._normalize_gender(extracted)
+        
+        return extracted
+    
+    def _extract_information(
+        self, 
+        last_question: str, 
+        user_response: str, 
+        info_target: str
+    ) -> str:
+        """Extract specific information with improved logic."""
+        
+        quick = self._quick_extract(last_question, user_response, info_target)
+        if quick:
+            return quick
         
+        # Use LLM for complex extraction
         try:
-            conversation = [
-                SystemMessage(content="Extract only the direct answer. Return JSON."),
-                HumanMessage(content=prompt)
-            ]
-            
-            response = self.llm.invoke(conversation)
-            response_text = response.content.strip()
-            
-            # Parse JSON
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            try:
-                data = json.loads(response_text)
-                extracted = data.get("extracted_answer", "NOT_PROVIDED")
-            except:
-                # Fallback: look for the pattern
-                if '"extracted_answer"' in response_text:
-                    import re
-                    match = re.search(r'"extracted_answer":\s*"([^"]+)"', response_text)
-                    extracted = match.group(1) if match else user_response.strip()
-                else:
-                    extracted = user_response.strip()
-            
-            # Normalize if it's a gender answer
-            if "gender" in info_target.lower() and extracted != "NOT_PROVIDED":
-                extracted = self._normalize_gender(extracted)
-            
-            return extracted
+            content = self._cascade_invoke(
+                self._extraction_messages(last_question, user_response), **EXTRACTION_CALL_KWARGS
+            )
+            return self._parse_extraction(content, user_response, info_target)
         
         except Exception as e:
-            logger.error(f"Extraction error: {e}")
+            logger.error("Extraction error: %s", e)
+            return user_response.strip()
+    
+    async def _aextract_information(
+        self, 
+        last_question: str, 
+        user_response: str, 
+        info_target: str
+    ) -> str:
+        """Async variant of _extract_information."""
+        quick = self._quick_extract(last_question, user_response, info_target)
+        if quick:
+            return quick
+        
+        try:
+            content = await self._acascade_invoke(
+                self._extraction_messages(last_question, user_response), **EXTRACTION_CALL_KWARGS
+            )
+            return self._parse_extraction(content, user_response, info_target)
+        
+        except Exception as e:
+            logger.error("Extraction error: %s", e)
             return user_response.strip()
     
     def _format_info_collected(self, info_collected: Dict) -> str:
-        """Format collected information for display."""
+        """
+        Format collected information for display.
+        
+        The last result is kept per instance: gathering state is copy-on-write,
+        so the same dict object always formats to the same text.
+        """
+        cached = self.__dict__.get("_collected_text")
+        if cached is not None and cached[0] is info_collected:
+            return cached[1]
+        
         if not info_collected:
-            return "No information collected yet."
+            text = "No information collected yet."
+        else:
+            formatted = []
+            for key, value in info_collected.items():
+                if key != "additional_info":  # Skip additional_info in display
+                    formatted.append(f"- {humanize_key(key)}: {value}")
+            text = "\n".join(formatted)
         
-        formatted = []
-        for key, value in info_collected.items():
-            if key != "additional_info":  # Skip additional_info in display
-                formatted.append(f"- {key.replace('_', ' ').title()}: {value}")
-        return "\n".join(formatted)
\ No newline at end of file
+        self._collected_text = (info_collected, text)
+        return text
+    
+    def _extend_info_text(self, old: Dict, new: Dict, key: str) -> None:
+        """Carry the formatted text of old over to new when new only appends key."""
+        cached = self.__dict__.get("_collected_text")
+        if cached is None or cached[0] is not old or key in old or key == "additional_info":
+            return
+        line = f"- {humanize_key(key)}: {new[key]}"
+        text = f"{cached[1]}\n{line}" if old and cached[1] else line
+        self._collected_text = (new, text)
\ No newline at end of file
@@ -9,15 +9,149 @@ This node identifies:
 """
 
 from langchain_core.messages import HumanMessage, SystemMessage
-from typing import Dict, List
+from typing import Dict, List, Optional
 from state import FamilyLawState
 import os
+import re
+import copy
 import json
+import hashlib
 import logging
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+import threading
+from collections import OrderedDict
+from contextlib import aclosing
+from functools import cached_property
+from llm_client import get_chat_model, llm_semaphore
+from llm_utils import PromptTemplate
 
 logger = logging.getLogger(__name__)
 
+# Decode budget for one analysis (~150 tokens of JSON).
+# Stop on a run of blank lines after the object. No fence stop: "\n```" also
+# matches the opening fence after a preamble line, and the streaming parser
+# already ends the call at the first complete object.
+ANALYSIS_MAX_TOKENS = int(os.getenv("ANALYSIS_MAX_TOKENS", "384"))
+ANALYSIS_CALL_KWARGS = {"max_tokens": ANALYSIS_MAX_TOKENS, "stop": ["\n\n\n"]}
+
+# With LLM_GRAMMAR_DECODING=true analysis replies are schema-constrained (TGI
+# grammar support), so they always parse; fence stripping stays for servers
+# that ignore response_format.
+LLM_GRAMMAR_DECODING = os.getenv("LLM_GRAMMAR_DECODING", "false").lower() == "true"
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "user_intent": {"type": "string"},
+        "intent_confidence": {"enum": ["high", "medium", "low"]},
+        "info_provided": {"type": "object"},
+        "info_needed": {"type": "array", "items": {"type": "string"}},
+        "follow_up_question": {"type": ["string", "null"]}
+    },
+    "required": ["user_intent", "intent_confidence", "info_provided", "info_needed"]
+}
+if LLM_GRAMMAR_DECODING:
+    ANALYSIS_CALL_KWARGS["response_format"] = {"type": "json", "value": ANALYSIS_SCHEMA}
+
+_DECODER = json.JSONDecoder()
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+
+# Opt-in: answer long, clearly categorised queries with the keyword fallback
+# instead of the LLM (see QueryAnalyzer._keyword_shortcut)
+ANALYZER_KEYWORD_SHORTCUT = os.getenv("ANALYZER_KEYWORD_SHORTCUT", "false").lower() == "true"
+KEYWORD_SHORTCUT_MIN_WORDS = int(os.getenv("KEYWORD_SHORTCUT_MIN_WORDS", "50"))
+
+# LRU of successful analyses keyed on the normalized query (case and whitespace
+# folded); FAQ-style queries repeat across users.
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "1024"))
+_analysis_cache = OrderedDict()
+_analysis_cache_lock = threading.Lock()
+
+
+def _analysis_key(query: str) -> str:
+    normalized = " ".join(query.lower().split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[Dict]:
+    """Cached analysis (a deep copy, so callers may mutate it) or None."""
+    with _analysis_cache_lock:
+        result = _analysis_cache.get(key)
+        if result is None:
+            return None
+        _analysis_cache.move_to_end(key)
+    return copy.deepcopy(result)
+
+
+def _cache_put(key: str, result: Dict) -> None:
+    with _analysis_cache_lock:
+        _analysis_cache[key] = copy.deepcopy(result)
+        _analysis_cache.move_to_end(key)
+        while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+
+
+def clear_analysis_cache() -> None:
+    with _analysis_cache_lock:
+        _analysis_cache.clear()
+
+
+# Keyword fallback, checked in priority order: (keywords, case_type, user_intent)
+_FALLBACK_CASE_TYPES = (
+    (("violence", "abuse", "beat", "assault", "hit", "threat"),
+     "domestic_violence", "Seeking help with domestic violence"),
+    (("dowry", "dahej", "demand", "harassment"),
+     "dowry", "Seeking help with dowry-related issues"),
+    (("custody", "children", "child", "visitation"),
+     "child_custody", "Seeking help with child custody"),
+    (("divorce", "separation", "marriage"),
+     "divorce", "Seeking help with divorce/separation"),
+    (("maintenance", "alimony", "support"),
+     "maintenance", "Seeking help with maintenance/alimony"),
+)
+# Keywords recorded as info_collected flags: (keywords, info key)
+_FALLBACK_INFO_FLAGS = (
+    (("married", "marriage"), "marriage_mentioned"),
+    (("child",), "children_mentioned"),
+)
+
+
+def _keyword_labels() -> Dict[str, frozenset]:
+    """
+    Map each fallback keyword to the case types and info flags it implies.
+
+    A keyword also carries the labels of its prefixes ("children" -> "child"),
+    because the scan only reports the longest keyword starting at a position.
+    """
+    labels = {}
+    for words, case_type, _ in _FALLBACK_CASE_TYPES:
+        for word in words:
+            labels.setdefault(word, set()).add(case_type)
+    for words, flag in _FALLBACK_INFO_FLAGS:
+        for word in words:
+            labels.setdefault(word, set()).add(flag)
+    return {
+        word: frozenset().union(*(found for prefix, found in labels.items() if word.startswith(prefix)))
+        for word in labels
+    }
+
+
+_KEYWORD_LABELS = _keyword_labels()
+# Zero-width lookahead so one pass finds every keyword substring, overlapping or not
+_KEYWORD_SCAN_RE = re.compile(
+    "(?=(%s))" % "|".join(map(re.escape, sorted(_KEYWORD_LABELS, key=len, reverse=True)))
+)
+
+
+def _first_object(text: str) -> Optional[Dict]:
+    """The first complete top-level JSON object in a (partial) reply, decoded, or None."""
+    start = text.find("{")
+    if start == -1:
+        return None
+    try:
+        return _DECODER.raw_decode(text, start)[0]
+    except json.JSONDecodeError:
+        return None
+
 
 class QueryAnalyzer:
     """
@@ -44,7 +178,8 @@ RESPONSE FORMAT (Strictly JSON only, no other text):
   "info_needed": [
     "detailed_info_1",
     "detailed_info_2"
-  ]
+  ],
+  "follow_up_question": "the one question to ask the user next, or null"
 }}
 
 CONFIDENCE GUIDELINES:
@@ -58,121 +193,263 @@ RULES:
 - Extract dates, relationships, incidents from the query
 - Be specific about what's needed (e.g., "marriage_date" not just "details")
 - If query is too vague, set confidence to "low"
+- "follow_up_question": if confidence is "low", briefly ask the user to clarify their situation; otherwise ask, in one clear and empathetic sentence, for the FIRST item in "info_needed"; null if "info_needed" is empty
 
 USER QUERY:
 {query}
 
 ANALYSIS (JSON only):"""
     
+    BATCH_ANALYSIS_SUFFIX = """Analyze EACH of the {count} numbered queries below independently.
+Return a JSON array of exactly {count} analysis objects (format above), in the same order, and no other text.
+
+{queries}
+
+ANALYSES (JSON array only):"""
+    
+    # Parsed once; .format() only joins the literal spans with the query
+    _PROMPT_TEMPLATE = PromptTemplate(QUERY_ANALYSIS_PROMPT)
+    _BATCH_TEMPLATE = PromptTemplate(QUERY_ANALYSIS_PROMPT.split("USER QUERY:")[0] + BATCH_ANALYSIS_SUFFIX)
+    
+    # Information to ask for per case type (fallback analysis)
+    _CASE_NEEDS = {
+        "divorce": ("marriage_date", "grounds_for_divorce", "children_details", "property_details"),
+        "domestic_violence": ("current_safety_status", "incident_details", "relationship_to_perpetrator", "previous_complaints"),
+        "child_custody": ("children_ages", "current_custody_arrangement", "reason_for_custody_change"),
+        "dowry": ("marriage_date", "dowry_demands_details", "evidence_available", "complaints_filed"),
+        "maintenance": ("marriage_duration", "income_details", "dependents", "current_financial_status"),
+        "general": ("detailed_situation", "timeline_of_events", "desired_outcome")
+    }
+    
     def __init__(self, huggingface_api_key: str = None):
-        """Initialize the QueryAnalyzer with LLM."""
-        api_key = huggingface_api_key or os.getenv("HUGGINGFACE_API_KEY")
-        
-        self.llm = ChatHuggingFace(
-            llm=HuggingFaceEndpoint(
-                repo_id = os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct"),
-                huggingfacehub_api_token=api_key,
-                task="text-generation",
-                max_new_tokens=1024,
-            )
+        """Initialize the QueryAnalyzer; the shared LLM client is fetched on first use."""
+        self.huggingface_api_key = huggingface_api_key
+    
+    @cached_property
+    def llm(self):
+        return get_chat_model(
+            max_new_tokens=1024,
+            temperature=0.8,  # HuggingFaceEndpoint's default, as before
+            task="text-generation",
+            api_key=self.huggingface_api_key
         )
     
-    def analyze_query(self, state: FamilyLawState) -> Dict:
+    def analyze_query(self, state: FamilyLawState, force_llm: bool = False) -> Dict:
         """
         Analyze the user's query to understand intent and information needs.
         
         Args:
             state: FamilyLawState containing the query
+            force_llm: Skip the keyword shortcut (e.g. for evaluation runs)
             
         Returns:
             Dict with analysis results
         """
         query = state["query"]
+        key = _analysis_key(query)
+        cached = _cache_get(key)
+        if cached is not None:
+            logger.info("⚡ Query analysis cache hit")
+            return cached
         
-        # Prepare prompt
-        prompt = self.QUERY_ANALYSIS_PROMPT.format(query=query)
+        shortcut = self._keyword_shortcut(query, force_llm)
+        if shortcut is not None:
+            return shortcut
         
         try:
-            # Get LLM analysis
-            conversation = [
-                SystemMessage(content="You are a legal query analyzer. Respond ONLY with valid JSON."),
-                HumanMessage(content=prompt)
-            ]
-            
             logger.info("Invoking LLM for query analysis")
-            response = self.llm.invoke(conversation)
-            response_text = response.content.strip()
-            
+            buffer, analysis = "", None
+            for chunk in self.llm.stream(self._analysis_messages(query), **ANALYSIS_CALL_KWARGS):
+                buffer += chunk.content
+                # Stop reading as soon as the analysis object is complete;
+                # the decoded object is used directly, not parsed again
+                if "}" in chunk.content:
+                    analysis = _first_object(buffer)
+                    if analysis is not None:
+                        break
+            if analysis is not None:
+                result = self._analysis_result(analysis)
+            else:
+                result = self._parse_analysis(buffer.strip())
+        
+        except Exception as e:
+            logger.error("Query analysis error: %s", e)
+            return self.fallback_analysis(query)
+        
+        if result is None:
+            return self.fallback_analysis(query)
+        _cache_put(key, result)
+        return result
+    
+    async def aanalyze_query(self, state: FamilyLawState, force_llm: bool = False) -> Dict:
+        """Async variant of analyze_query, bounded by the shared LLM semaphore."""
+        query = state["query"]
+        key = _analysis_key(query)
+        cached = _cache_get(key)
+        if cached is not None:
+            logger.info("⚡ Query analysis cache hit")
+            return cached
+        
+        shortcut = self._keyword_shortcut(query, force_llm)
+        if shortcut is not None:
+            return shortcut
+        
+        try:
+            logger.info("Invoking LLM for query analysis")
+            buffer, analysis = "", None
+            async with llm_semaphore():
+                stream = self.llm.astream(self._analysis_messages(query), **ANALYSIS_CALL_KWARGS)
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        buffer += chunk.content
+                        if "}" in chunk.content:
+                            analysis = _first_object(buffer)
+                            if analysis is not None:
+                                break
+            if analysis is not None:
+                result = self._analysis_result(analysis)
+            else:
+                result = self._parse_analysis(buffer.strip())
+        
+        except Exception as e:
+            logger.error("Query analysis error: %s", e)
+            return self.fallback_analysis(query)
+        
+        if result is None:
+            return self.fallback_analysis(query)
+        _cache_put(key, result)
+        return result
+    
+    def _keyword_shortcut(self, query: str, force_llm: bool) -> Optional[Dict]:
+        """
+        Keyword analysis for long queries with a clear case type, skipping the LLM.
+        
+        Only with ANALYZER_KEYWORD_SHORTCUT=true: the keyword path extracts far
+        less detail than the model, so it trades quality for latency.
+        """
+        if force_llm or not ANALYZER_KEYWORD_SHORTCUT:
+            return None
+        if len(query.split()) <= KEYWORD_SHORTCUT_MIN_WORDS:
+            return None
+        
+        analysis = self.fallback_analysis(query)
+        if analysis["case_type"] == "general":
+            return None
+        
+        logger.info("⚡ Keyword shortcut: case_type=%s, LLM skipped", analysis["case_type"])
+        return analysis
+    
+    def _analysis_messages(self, query: str) -> List:
+        prompt = self._PROMPT_TEMPLATE.format(query=query)
+        return [
+            SystemMessage(content="You are a legal query analyzer. Respond ONLY with valid JSON."),
+            HumanMessage(content=prompt)
+        ]
+    
+    def _parse_analysis(self, response_text: str) -> Optional[Dict]:
+        """Turn the model's JSON reply into analysis results (None if unparseable)."""
+        try:
             # Extract JSON from response
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
+            fence = _FENCE_RE.search(response_text)
+            if fence:
+                response_text = fence.group(1).strip()
+            else:
+                start, end = response_text.find("{"), response_text.rfind("}")
+                if start != -1 and end > start:
+                    response_text = response_text[start:end + 1]
             
             # Parse JSON
             analysis = json.loads(response_text)
-            
-            # Validate and set defaults
-
-            user_intent = analysis.get("user_intent", "")
-            intent_confidence = analysis.get("intent_confidence", "medium")
-            info_provided = analysis.get("info_provided", {})
-            info_needed = analysis.get("info_needed", [])
-            
-            # Determine if we have sufficient info
-            has_sufficient_info = len(info_needed) == 0 and len(info_provided) > 0
-            
-            logger.info(f"Query analysis: intent_confidence={intent_confidence}, "
-                       f"user_type={user_intent}, needs={len(info_needed)} items")
-            
-            return {
-                "user_intent": user_intent,
-                "intent_confidence": intent_confidence,
-                "info_collected": info_provided,
-                "info_needed_list": info_needed,
-                "has_sufficient_info": has_sufficient_info
-            }
+            return self._analysis_result(analysis)
         
         except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing error: {str(e)}\nResponse: {response_text[:200]}")
-            return self.fallback_analysis(query)
+            logger.error("JSON parsing error: %s\nResponse: %.200s", e, response_text)
+            return None
+    
+    def _analysis_result(self, analysis: Dict) -> Dict:
+        """Validate one parsed analysis object and fill in defaults."""
+        user_intent = analysis.get("user_intent", "")
+        intent_confidence = analysis.get("intent_confidence", "medium")
+        info_provided = analysis.get("info_provided", {})
+        info_needed = analysis.get("info_needed", [])
+        follow_up_question = analysis.get("follow_up_question")
+        if not isinstance(follow_up_question, str) or not follow_up_question.strip():
+            follow_up_question = None
         
-        except Exception as e:
-            logger.error(f"Query analysis error: {str(e)}")
-            return self.fallback_analysis(query)
+        # Determine if we have sufficient info
+        has_sufficient_info = len(info_needed) == 0 and len(info_provided) > 0
+        
+        logger.info("Query analysis: intent_confidence=%s, user_type=%s, needs=%d items",
+                    intent_confidence, user_intent, len(info_needed))
+        
+        return {
+            "user_intent": user_intent,
+            "intent_confidence": intent_confidence,
+            "info_collected": info_provided,
+            "info_needed_list": info_needed,
+            "has_sufficient_info": has_sufficient_info,
+            "follow_up_question": follow_up_question
+        }
+    
+    def analyze_queries_batched(self, queries: List[str], batch_size: int = 8) -> List[Dict]:
+        """
+        Analyze queries in groups of batch_size, one LLM call per group.
+        
+        For offline/bulk jobs; interactive turns use analyze_query. A group whose
+        reply is not a JSON array of the right length is re-run query by query.
+        """
+        results = []
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            prompt = self._BATCH_TEMPLATE.format(
+                count=len(batch),
+                queries="\n\n".join(f"QUERY {i}:\n{q}" for i, q in enumerate(batch, 1))
+            )
+            conversation = [
+                SystemMessage(content="You are a legal query analyzer. Respond ONLY with valid JSON."),
+                HumanMessage(content=prompt)
+            ]
+            
+            try:
+                logger.info("Invoking LLM for batched query analysis (%d queries)", len(batch))
+                call_kwargs = {"max_tokens": ANALYSIS_MAX_TOKENS * len(batch)}
+                if LLM_GRAMMAR_DECODING:
+                    call_kwargs["response_format"] = {"type": "json", "value": {
+                        "type": "array", "items": ANALYSIS_SCHEMA,
+                        "minItems": len(batch), "maxItems": len(batch)
+                    }}
+                response = self.llm.invoke(conversation, **call_kwargs)
+                text = response.content
+                analyses, _ = _DECODER.raw_decode(text, text.index("["))
+                if not isinstance(analyses, list) or len(analyses) != len(batch):
+                    raise ValueError(f"expected {len(batch)} analyses")
+                results.extend(
+                    self._analysis_result(a) if isinstance(a, dict) else self.fallback_analysis(q)
+                    for a, q in zip(analyses, batch)
+                )
+            except Exception as e:
+                logger.warning("Batched analysis failed, analyzing one by one: %s", e)
+                results.extend(self.analyze_query({"query": q}) for q in batch)
+        
+        return results
     
     def fallback_analysis(self, query: str) -> Dict:
         """
         Fallback keyword-based analysis if LLM fails.
         """
-        query_lower = query.lower()
-        
-        # Determine case type
-        if any(word in query_lower for word in ["violence", "abuse", "beat", "assault", "hit", "threat"]):
-            case_type = "domestic_violence"
-            user_intent = "Seeking help with domestic violence"
-        elif any(word in query_lower for word in ["dowry", "dahej", "demand", "harassment"]):
-            case_type = "dowry"
-            user_intent = "Seeking help with dowry-related issues"
-        elif any(word in query_lower for word in ["custody", "children", "child", "visitation"]):
-            case_type = "child_custody"
-            user_intent = "Seeking help with child custody"
-        elif any(word in query_lower for word in ["divorce", "separation", "marriage"]):
-            case_type = "divorce"
-            user_intent = "Seeking help with divorce/separation"
-        elif any(word in query_lower for word in ["maintenance", "alimony", "support"]):
-            case_type = "maintenance"
-            user_intent = "Seeking help with maintenance/alimony"
-        else:
-            case_type = "general"
-            user_intent = "Seeking family law advice"
+        # Every case type and info flag whose keywords appear, in one scan
+        labels = set()
+        for match in _KEYWORD_SCAN_RE.finditer(query.lower()):
+            labels |= _KEYWORD_LABELS[match.group(1)]
+        
+        # Determine case type (first matching category wins)
+        case_type, user_intent = next(
+            ((case, intent) for _, case, intent in _FALLBACK_CASE_TYPES if case in labels),
+            ("general", "Seeking family law advice")
+        )
         
         # Basic information extraction
-        info_provided = {}
-        if "married" in query_lower or "marriage" in query_lower:
-            info_provided["marriage_mentioned"] = "yes"
-        if "child" in query_lower:
-            info_provided["children_mentioned"] = "yes"
+        info_provided = {flag: "yes" for _, flag in _FALLBACK_INFO_FLAGS if flag in labels}
         
         # Determine confidence and info needs
         word_count = len(query.split())
@@ -189,7 +466,7 @@ ANALYSIS (JSON only):"""
             info_needed = []  # Will trigger clarification
             has_sufficient_info = False
         
-        logger.info(f"Fallback analysis: case_type={case_type}, confidence={intent_confidence}")
+        logger.info("Fallback analysis: case_type=%s, confidence=%s", case_type, intent_confidence)
         
         return {
             "user_intent": user_intent,
@@ -202,12 +479,4 @@ ANALYSIS (JSON only):"""
     
     def _get_case_specific_needs(self, case_type: str) -> List[str]:
         """Get case-specific information needs."""
-        needs_map = {
-            "divorce": ["marriage_date", "grounds_for_divorce", "children_details", "property_details"],
-            "domestic_violence": ["current_safety_status", "incident_details", "relationship_to_perpetrator", "previous_complaints"],
-            "child_custody": ["children_ages", "current_custody_arrangement", "reason_for_custody_change"],
-            "dowry": ["marriage_date", "dowry_demands_details", "evidence_available", "complaints_filed"],
-            "maintenance": ["marriage_duration", "income_details", "dependents", "current_financial_status"],
-            "general": ["detailed_situation", "timeline_of_events", "desired_outcome"]
-        }
-        return needs_map.get(case_type, needs_map["general"])
\ No newline at end of file
+        return list(self._CASE_NEEDS.get(case_type, self._CASE_NEEDS["general"]))
\ No newline at end of file
@@ -3,14 +3,39 @@ Fixed ReasoningExplainer - Returns data structures only, NO text appending.
 """
 
 from typing import List, Dict
+import re
 import json
 import logging
-from pydantic import BaseModel
+from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+# Provisions detected in the response: (trigger texts, provision), in listing order
+_PROVISIONS = (
+    (("Section 13", "s.13", "s. 13"), "Hindu Marriage Act, 1955 - Section 13"),
+    (("Section 125", "s.125", "s. 125"), "Code of Criminal Procedure - Section 125"),
+    (("498A",), "Indian Penal Code - Section 498A"),
+    (("Domestic Violence Act", "PWDVA"), "Protection of Women from Domestic Violence Act, 2005"),
+    (("Guardians and Wards Act",), "Guardians and Wards Act, 1890"),
+)
+_PROVISION_BY_TRIGGER = {trigger: provision for triggers, provision in _PROVISIONS for trigger in triggers}
+# One pass over the response finds every trigger (longest alternative first)
+_PROVISION_RE = re.compile(
+    "|".join(map(re.escape, sorted(_PROVISION_BY_TRIGGER, key=len, reverse=True)))
+)
 
-class ReasoningStep(BaseModel):
+# Issues a precedent can share with the case: (keyword, matching factor)
+_CASE_FACTORS = (
+    ("divorce", "Both cases involve divorce proceedings"),
+    ("custody", "Both cases address child custody issues"),
+    ("maintenance", "Both cases involve maintenance claims"),
+    ("abuse", "Both cases involve allegations of abuse"),
+)
+_FACTOR_RE = re.compile("|".join(keyword for keyword, _ in _CASE_FACTORS))
+
+
+@dataclass(slots=True)
+class ReasoningStep:
     step_number: int
     step_type: str  # "analysis", "legal_rule", "precedent", "conclusion"
     title: str
@@ -20,7 +45,8 @@ class ReasoningStep(BaseModel):
     legal_provisions: List[str]
 
 
-class PrecedentExplanation(BaseModel):
+@dataclass(slots=True)
+class PrecedentExplanation:
     precedent_title: str
     similarity_score: float
     matching_factors: List[str]
@@ -117,10 +143,23 @@ class ReasoningExplainer:
         explanations = []
         
         try:
-            for i, chunk in enumerate(retrieved_chunks[:5]):  # Top 5 precedents
-                explanation = self._analyze_precedent(case_summary, chunk, i)
+            # The case summary's keywords are the same for every precedent
+            case_terms = frozenset(_FACTOR_RE.findall(case_summary.lower()))
+            
+            # Top 5 distinct precedents: chunks repeating the same passage
+            # (same judgment retrieved twice) are explained once
+            seen = set()
+            for chunk in retrieved_chunks:
+                fingerprint = " ".join((chunk.get('content') or '')[:500].lower().split())
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                
+                explanation = self._analyze_precedent(case_summary, chunk, len(seen) - 1, case_terms)
                 if explanation:
                     explanations.append(explanation)
+                if len(seen) == 5:
+                    break
             
             logger.info(f"✓ Generated {len(explanations)} precedent explanations (structured data only)")
             return explanations
@@ -152,23 +191,8 @@ class ReasoningExplainer:
     
     def _extract_legal_provisions(self, response: str) -> List[str]:
         """Extract legal provisions mentioned in response."""
-        provisions = []
-        
-        # Common patterns
-        if "Section 13" in response or "s.13" in response or "s. 13" in response:
-            provisions.append("Hindu Marriage Act, 1955 - Section 13")
-        
-        if "Section 125" in response or "s.125" in response or "s. 125" in response:
-            provisions.append("Code of Criminal Procedure - Section 125")
-        
-        if "498A" in response or "Section 498A" in response:
-            provisions.append("Indian Penal Code - Section 498A")
-        
-        if "Domestic Violence Act" in response or "PWDVA" in response:
-            provisions.append("Protection of Women from Domestic Violence Act, 2005")
-        
-        if "Guardians and Wards Act" in response:
-            provisions.append("Guardians and Wards Act, 1890")
+        found = {_PROVISION_BY_TRIGGER[trigger] for trigger in _PROVISION_RE.findall(response)}
+        provisions = [provision for _, provision in _PROVISIONS if provision in found]
         
         return provisions if provisions else ["Indian Family Law"]
     
@@ -188,7 +212,8 @@ class ReasoningExplainer:
         self,
         case_summary: str,
         chunk: Dict,
-        index: int
+        index: int,
+        case_terms: frozenset = None
     ) -> PrecedentExplanation:
         """Analyze a single precedent."""
         try:
@@ -200,7 +225,7 @@ class ReasoningExplainer:
             title = metadata.get('title', f'Precedent {index + 1}')
             
             # Simple matching analysis
-            matching_factors = self._find_matching_factors(case_summary, content)
+            matching_factors = self._find_matching_factors(case_summary, content, case_terms)
             different_factors = self._find_different_factors(case_summary, content)
             
             # Extract key excerpt (first meaningful sentence)
@@ -226,21 +251,12 @@ class ReasoningExplainer:
             logger.error(f"Error analyzing precedent {index}: {e}")
             return None
     
-    def _find_matching_factors(self, case_summary: str, content: str) -> List[str]:
-        """Find factors that match between case and precedent."""
-        factors = []
-        
-        if "divorce" in case_summary.lower() and "divorce" in content.lower():
-            factors.append("Both cases involve divorce proceedings")
-        
-        if "custody" in case_summary.lower() and "custody" in content.lower():
-            factors.append("Both cases address child custody issues")
-        
-        if "maintenance" in case_summary.lower() and "maintenance" in content.lower():
-            factors.append("Both cases involve maintenance claims")
-        
-        if "abuse" in case_summary.lower() and "abuse" in content.lower():
-            factors.append("Both cases involve allegations of abuse")
+    def _find_matching_factors(self, case_summary: str, content: str, case_terms: frozenset = None) -> List[str]:
+        """Find factors that match between case and precedent (case_terms: pre-scanned summary keywords)."""
+        if case_terms is None:
+            case_terms = frozenset(_FACTOR_RE.findall(case_summary.lower()))
+        shared = case_terms.intersection(_FACTOR_RE.findall(content.lower()))
+        factors = [factor for keyword, factor in _CASE_FACTORS if keyword in shared]
         
         if not factors:
             factors.append("Similar family law context")
@@ -262,8 +278,9 @@ class ReasoningExplainer:
     
     def _extract_key_excerpt(self, content: str) -> str:
         """Extract a key excerpt from the precedent."""
-        # Get first meaningful sentence (simplified)
-        sentences = content.split('.')
+        # Get first meaningful sentence (simplified); only the first three are
+        # considered, so split no further than that
+        sentences = content.split('.', 3)
         for sentence in sentences[:3]:
             if len(sentence.strip()) > 50:
                 excerpt = sentence.strip()
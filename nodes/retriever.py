@@ -1,7 +1,11 @@
-from logging import root
+import os
+import time
+import numpy as np
+import threading
+from concurrent.futures import Future
 from pymilvus import connections, Collection
-from sentence_transformers import SentenceTransformer
-from typing import Dict
+from typing import Dict, List
+from functools import lru_cache
 from state import FamilyLawState
 
 # Configuration
@@ -11,8 +15,111 @@ COLLECTION_NAME = "family_law_cases"
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 TOP_K = 5
 
-# Initialize model (loaded once)
-model = SentenceTransformer(MODEL_NAME)
+# Search breadth: ef for the HNSW index (milvus_store.py), nprobe for collections
+# still on the older IVF_FLAT index; each index type ignores the other's key.
+MILVUS_SEARCH_EF = int(os.getenv("MILVUS_SEARCH_EF", "64"))
+MILVUS_SEARCH_NPROBE = int(os.getenv("MILVUS_SEARCH_NPROBE", "10"))
+
+# With a lossy index (IVF_PQ), fetch RERANK_FACTOR x TOP_K candidates and
+# re-score them by exact cosine similarity on their stored vectors.
+MILVUS_RERANK_FACTOR = int(os.getenv("MILVUS_RERANK_FACTOR", "1"))
+
+# Optional ONNX Runtime backend with int8 weights (pip install ".[onnx]"); the
+# quantized export ships in the model repo. Its vectors differ slightly from the
+# fp32 ones the collection was built with, so check recall before enabling.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+
+# Torch backend: dynamic int8 quantization of the transformer's Linear layers
+# (CPU only). Same recall caveat as the ONNX int8 export.
+EMBEDDING_INT8 = os.getenv("EMBEDDING_INT8", "false").lower() == "true"
+
+# Torch backend: half-precision weights, fp16 on CUDA (picked automatically when
+# present) or bf16 on CPUs with AVX-512-BF16/AMX. Same recall caveat.
+EMBEDDING_HALF = os.getenv("EMBEDDING_HALF", "false").lower() == "true"
+
+# The model and the Milvus collection are loaded on first retrieval, so
+# processes that never retrieve don't pay for torch or the connection
+_load_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _load_model():
+    from sentence_transformers import SentenceTransformer
+    if EMBEDDING_BACKEND == "onnx":
+        return SentenceTransformer(
+            MODEL_NAME, backend="onnx", model_kwargs={"file_name": EMBEDDING_ONNX_FILE}
+        )
+    model = SentenceTransformer(MODEL_NAME)
+    if EMBEDDING_HALF:
+        import torch
+        model.to(torch.float16 if model.device.type == "cuda" else torch.bfloat16)
+    elif EMBEDDING_INT8:
+        import torch
+        transformer = model[0]
+        transformer.auto_model = torch.ao.quantization.quantize_dynamic(
+            transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+def get_model():
+    """The embedding model (loaded once)."""
+    with _load_lock:
+        return _load_model()
+
+# Opt-in micro-batching: retrievals running concurrently in worker threads wait
+# up to this long so their queries are encoded in one model.encode call.
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "0"))
+
+class _EmbeddingBatcher:
+    """
+    Coalesce concurrent single-query encodes into one batch.
+
+    The first caller to arrive waits for the window, then encodes everything
+    queued meanwhile (encode() already sorts a batch by length) and hands each
+    waiting caller its vector.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._pending = []  # (text, Future)
+
+    def encode(self, text: str):
+        future = Future()
+        with self._lock:
+            self._pending.append((text, future))
+            leader = len(self._pending) == 1
+        
+        if leader:
+            time.sleep(self.window_seconds)
+            with self._lock:
+                batch, self._pending = self._pending, []
+            try:
+                vectors = get_model().encode([t for t, _ in batch])
+                for (_, waiting), vector in zip(batch, vectors):
+                    waiting.set_result(vector)
+            except Exception as e:
+                for _, waiting in batch:
+                    waiting.set_exception(e)
+        
+        return future.result()
+
+_batcher = _EmbeddingBatcher(EMBEDDING_BATCH_WINDOW_MS / 1000) if EMBEDDING_BATCH_WINDOW_MS > 0 else None
+
+@lru_cache(maxsize=1024)
+def _cached_embedding(text: str) -> np.ndarray:
+    vector = _batcher.encode(text) if _batcher else get_model().encode([text])[0]
+    vector = np.asarray(vector, dtype=np.float32)
+    vector.flags.writeable = False  # shared by every cache hit
+    return vector
+
+def embed_query(text: str) -> np.ndarray:
+    """
+    Query embedding (float32, read-only), reused when the same query is retrieved again.
+    MiniLM's tokenizer is uncased and splits on whitespace, so the cache key
+    folds case and whitespace without changing the embedding.
+    """
+    return _cached_embedding(" ".join(text.lower().split()))
 
 def connect_and_load():
     """Connect to Milvus and load collection."""
@@ -25,71 +132,116 @@ def connect_and_load():
         print(f"❌ Error connecting to Milvus: {e}")
         return None
 
-# Global collection instance
-collection = connect_and_load()
+@lru_cache(maxsize=1)
+def _load_collection():
+    return connect_and_load()
 
-def retrieve_documents(state: FamilyLawState) -> Dict:
-    """
-    Retrieve relevant documents from Milvus based on the query.
-    """
-    # Replace line 34 with this:
-    root = state.get("root_query") or ""
-    query = state.get("query") or ""
-    combined_query = root + query
+def get_collection():
+    """The loaded collection, or None if Milvus was unreachable (connected once)."""
+    with _load_lock:
+        return _load_collection()
 
-    query = combined_query
+def _rerank_exact(query_embedding: np.ndarray, hits) -> list:
+    """Top TOP_K (hit, score) pairs by exact cosine similarity to the query."""
+    hits = list(hits)
+    if not hits:
+        return []
+    vectors = np.asarray([hit.entity.get("embedding") for hit in hits], dtype=np.float32)
+    scores = vectors @ query_embedding / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(query_embedding) + 1e-12
+    )
+    order = np.argsort(-scores)[:TOP_K]
+    return [(hits[i], float(scores[i])) for i in order]
 
+def embed_queries(texts: List[str]) -> List[np.ndarray]:
+    """Embeddings for several queries; more than one is encoded as a single batch."""
+    if len(texts) == 1:
+        return [embed_query(texts[0])]
+    vectors = get_model().encode([" ".join(text.lower().split()) for text in texts])
+    return list(np.asarray(vectors, dtype=np.float32))
+
+def search_queries(queries: List[str]) -> List[Dict]:
+    """
+    Retrieve documents for several queries in one Milvus search.
+    Returns one {"retrieved_chunks", "sources"} dict per query, in input order.
+    """
+    collection = get_collection()
     if not collection:
-        return {
-            "retrieved_chunks": [],
-            "sources": []
-        }
+        return [{"retrieved_chunks": [], "sources": []} for _ in queries]
     
-    # Generate query embedding
-    query_embedding = model.encode([query])[0].tolist()
+    # Generate query embeddings
+    query_embeddings = embed_queries(queries)
     
-    # Search in Milvus
-    search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
+    # Search in Milvus (HNSW rejects an ef below the result limit)
+    output_fields = ["content", "parent_id", "title", "query_text", "url", "category"]
+    rerank = MILVUS_RERANK_FACTOR > 1
+    limit = TOP_K * MILVUS_RERANK_FACTOR if rerank else TOP_K
+    search_params = {
+        "metric_type": "COSINE",
+        "params": {"ef": max(MILVUS_SEARCH_EF, limit), "nprobe": MILVUS_SEARCH_NPROBE}
+    }
     
     results = collection.search(
-        data=[query_embedding],
+        data=query_embeddings,
         anns_field="embedding",
         param=search_params,
-        limit=TOP_K,
-        output_fields=["content", "parent_id", "title", "query_text", "url", "category"]
+        limit=limit,
+        output_fields=output_fields + ["embedding"] if rerank else output_fields
     )
     
-    # Process results
-    retrieved_chunks = []
-    sources = []
+    if rerank:
+        results = [_rerank_exact(embedding, hits) for embedding, hits in zip(query_embeddings, results)]
+    else:
+        results = [[(hit, hit.score) for hit in hits] for hits in results]
     
+    # Process results
+    outputs = []
     for hits in results:
-        for hit in hits:
-            chunk_data = {
-                "content": hit.entity.get("content"),
-                "score": hit.score,
+        retrieved_chunks = []
+        sources = []
+        seen_sources = set()
+        
+        for hit, score in hits:
+            entity = hit.entity
+            title = entity.get("title")
+            url = entity.get("url")
+            category = entity.get("category")
+            retrieved_chunks.append({
+                "content": entity.get("content"),
+                "score": score,
                 "metadata": {
-                    "parent_id": hit.entity.get("parent_id"),
-                    "title": hit.entity.get("title"),
-                    "query_text": hit.entity.get("query_text"),
-                    "url": hit.entity.get("url"),
-                    "category": hit.entity.get("category")
+                    "parent_id": entity.get("parent_id"),
+                    "title": title,
+                    "query_text": entity.get("query_text"),
+                    "url": url,
+                    "category": category
                 }
-            }
-            retrieved_chunks.append(chunk_data)
+            })
             
             # Add unique sources
-            source = {
-                "title": hit.entity.get("title"),
-                "url": hit.entity.get("url"),
-                "category": hit.entity.get("category")
-            }
-            if source not in sources:
-                sources.append(source)
+            source_key = (title, url, category)
+            if source_key not in seen_sources:
+                seen_sources.add(source_key)
+                sources.append({"title": title, "url": url, "category": category})
+        
+        outputs.append({
+            "retrieved_chunks": retrieved_chunks,
+            "sources": sources
+        })
+    
+    return outputs
+
+def retrieve_documents(state: FamilyLawState) -> Dict:
+    """
+    Retrieve relevant documents from Milvus based on the query.
+    """
+    # Replace line 34 with this:
+    root = state.get("root_query") or ""
+    query = state.get("query") or ""
+    combined_query = root + query
+
+    result = search_queries([combined_query])[0]
     
-    print(f"✅ Retrieved {len(retrieved_chunks)} chunks")
+    print(f"✅ Retrieved {len(result['retrieved_chunks'])} chunks")
     
-    return {
-        "retrieved_chunks": retrieved_chunks,
-        "sources": sources
-    }
\ No newline at end of file
+    return result
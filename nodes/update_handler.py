@@ -7,14 +7,73 @@ Handles scenarios like:
 3. User asks clarifying questions about the generated response
 """
 
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from typing import Dict, Optional, Literal
 import os
+import re
+import asyncio
+import json
+import hashlib
 import logging
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from llm_client import get_chat_model, llm_semaphore
+from llm_utils import parse_llm_json, humanize_key, PromptTemplate
 
 logger = logging.getLogger(__name__)
 
+# Classifications of recent follow-ups. "ok", "can you explain?" and "are you
+# sure?" recur verbatim, so a hit skips the endpoint round-trip entirely.
+INTENT_CACHE_SIZE = int(os.getenv("INTENT_CACHE_SIZE", "512"))
+_intent_cache = OrderedDict()
+_intent_cache_lock = threading.Lock()
+
+
+# Openings that settle the intent without the classifier. Anchored to the start
+# of the message and limited to unambiguous phrasings: "actually", "my friend"
+# or "what does the law say" also start plain statements and new questions, so
+# those go to the LLM.
+_INTENT_PATTERNS = (
+    (re.compile(r"^\s*(?:sorry,?\s+)?(?:i meant\b|correction\b|that'?s (?:wrong|not right|incorrect))", re.IGNORECASE),
+     "correction", True),
+    (re.compile(r"^\s*(?:are you sure\b|i doubt (?:that|it|this)\b|that doesn'?t sound right)", re.IGNORECASE),
+     "doubt_about_response", False),
+    (re.compile(r"^\s*(?:what do you mean\b|what does (?:that|this|it) mean\b|(?:can|could) you (?:please )?(?:explain|clarify)\b|please (?:explain|clarify)\b)", re.IGNORECASE),
+     "clarification_request", False),
+)
+
+
+def _match_intent(user_message: str) -> Optional[Dict]:
+    """Classification from the keyword patterns, or None to ask the LLM."""
+    for pattern, intent_type, requires_reprocessing in _INTENT_PATTERNS:
+        if pattern.search(user_message):
+            return {
+                "intent_type": intent_type,
+                "confidence": "high",
+                "specific_topic": user_message.strip(),
+                "requires_reprocessing": requires_reprocessing
+            }
+    return None
+
+
+def _intent_key(user_message: str, has_previous_response: bool, info_collected: Dict) -> tuple:
+    """Normalized message, response flag and a digest of the collected info."""
+    info_digest = hashlib.sha1(
+        json.dumps(info_collected or {}, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return user_message.strip().lower(), has_previous_response, info_digest
+
+
+def _is_follow_up(query: str, messages: list, response: str) -> bool:
+    """
+    Whether a message needs intent handling: there is an earlier answer to
+    follow up on and the message has some content (not "?" or "ok").
+    """
+    if len(query.strip()) < 3 or len(messages) <= 2 or not response:
+        return False
+    return any(isinstance(message, AIMessage) for message in messages)
+
 
 class UpdateHandler:
     """
@@ -61,19 +120,91 @@ Rules:
 - Be conservative: when unsure, classify as clarification_request
 
 YOUR CLASSIFICATION:"""
+    _INTENT_TEMPLATE = PromptTemplate(INTENT_CLASSIFICATION_PROMPT)
+    
+    # Characters of the previous advice quoted back in clarification/doubt prompts
+    PREVIOUS_RESPONSE_CHARS = 1000
     
     def __init__(self, huggingface_api_key: str = None):
-        """Initialize the update handler."""
-        api_key = huggingface_api_key or os.getenv("HUGGINGFACE_API_KEY")
-        
-        self.llm = ChatHuggingFace(
-            llm=HuggingFaceEndpoint(
-                repo_id = os.getenv("LLM_MODEL", "meta-llama/Llama-3.1-8B-Instruct"),
-                huggingfacehub_api_token=api_key,
-                task="text-generation",
-                max_new_tokens=512,
-            )
+        """Initialize the update handler; the shared LLM client is fetched on first use."""
+        self.huggingface_api_key = huggingface_api_key
+    
+    @cached_property
+    def llm(self):
+        return get_chat_model(
+            max_new_tokens=512,
+            temperature=0.8,  # HuggingFaceEndpoint's default, as before
+            task="text-generation",
+            api_key=self.huggingface_api_key
+        )
+    
+    def _known_intent(self, user_message: str, key: tuple) -> Optional[Dict]:
+        """Keyword or cached classification, if there is one."""
+        matched = _match_intent(user_message)
+        if matched is not None:
+            logger.info("   Intent (keyword): %s", matched["intent_type"])
+            return matched
+        
+        with _intent_cache_lock:
+            cached = _intent_cache.get(key)
+            if cached is not None:
+                _intent_cache.move_to_end(key)
+        if cached is not None:
+            logger.info("   Intent (cached): %s", cached.get("intent_type"))
+            return dict(cached)
+        return None
+    
+    def _intent_conversation(
+        self,
+        user_message: str,
+        has_previous_response: bool,
+        info_collected: Dict[str, str]
+    ) -> list:
+        # Format collected info
+        info_str = "\n".join([
+            f"- {humanize_key(k)}: {v}"
+            for k, v in info_collected.items()
+        ]) if info_collected else "None"
+        
+        prompt = self._INTENT_TEMPLATE.format(
+            has_previous_response=str(has_previous_response),
+            info_collected=info_str,
+            user_message=user_message
         )
+        
+        return [
+            SystemMessage(content="You are an intent classifier. Respond ONLY with valid JSON."),
+            HumanMessage(content=prompt)
+        ]
+    
+    def _parse_classification(self, response_text: str, key: tuple) -> Dict:
+        """Parse the classifier reply and cache it under key."""
+        classification = parse_llm_json(response_text)
+        if classification is None:
+            raise ValueError(f"No JSON object in classifier reply: {response_text[:200]!r}")
+        
+        intent_type = classification.get("intent_type", "clarification_request")
+        requires_reprocessing = classification.get("requires_reprocessing", False)
+        
+        logger.info("   Intent: %s", intent_type)
+        logger.info("   Reprocess: %s", requires_reprocessing)
+        
+        with _intent_cache_lock:
+            _intent_cache[key] = dict(classification)
+            _intent_cache.move_to_end(key)
+            while len(_intent_cache) > INTENT_CACHE_SIZE:
+                _intent_cache.popitem(last=False)
+        
+        return classification
+    
+    @staticmethod
+    def _fallback_classification() -> Dict:
+        return {
+            "intent_type": "clarification_request",
+            "confidence": "low",
+            "specific_topic": "unknown",
+            "requires_reprocessing": False
+        }
     
     def classify_followup_intent(
         self,
@@ -89,87 +220,53 @@ YOUR CLASSIFICATION:"""
         """
         logger.info("🔍 === CLASSIFYING FOLLOW-UP INTENT ===")
         
+        key = _intent_key(user_message, has_previous_response, info_collected)
+        known = self._known_intent(user_message, key)
+        if known is not None:
+            return known
+        
         try:
-            # Format collected info
-            info_str = "\n".join([
-                f"- {k.replace('_', ' ').title()}: {v}"
-                for k, v in info_collected.items()
-            ]) if info_collected else "None"
-            
-            prompt = self.INTENT_CLASSIFICATION_PROMPT.format(
-                has_previous_response=str(has_previous_response),
-                info_collected=info_str,
-                user_message=user_message
-            )
-            
-            conversation = [
-                SystemMessage(content="You are an intent classifier. Respond ONLY with valid JSON."),
-                HumanMessage(content=prompt)
-            ]
-            
+            conversation = self._intent_conversation(user_message, has_previous_response, info_collected)
             response = self.llm.invoke(conversation)
-            response_text = response.content.strip()
-            
-            # Extract JSON
-            import json
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-            classification = json.loads(response_text)
-            
-            intent_type = classification.get("intent_type", "clarification_request")
-            requires_reprocessing = classification.get("requires_reprocessing", False)
-            
-            logger.info(f"   Intent: {intent_type}")
-            logger.info(f"   Reprocess: {requires_reprocessing}")
-            
-            return classification
+            return self._parse_classification(response.content, key)
         
         except Exception as e:
-            logger.error(f"❌ Intent classification failed: {e}", exc_info=True)
+            logger.error("❌ Intent classification failed: %s", e, exc_info=True)
             # Safe fallback
-            return {
-                "intent_type": "clarification_request",
-                "confidence": "low",
-                "specific_topic": "unknown",
-                "requires_reprocessing": False
-            }
+            return self._fallback_classification()
     
-    def handle_update(self, state: Dict) -> Dict:
-        """
-        Main entry point for handling follow-up interactions.
-        
-        This determines:
-        1. What the user intends
-        2. Whether we need to reprocess (re-analyze, re-gather, re-generate)
-        3. How to route the request
-        """
-        query = state.get("query", "")
-        messages = state.get("messages", [])
-        info_collected = state.get("info_collected", {})
-        response = state.get("response", "")
-        
-        # Check if this is a follow-up (we have previous messages)
-        has_previous_response = len(messages) > 2 and bool(response)
-        
-        if not has_previous_response:
-            # First interaction, proceed normally
-            logger.info("First interaction - no update handling needed")
-            return state
+    async def aclassify_followup_intent(
+        self,
+        user_message: str,
+        has_previous_response: bool,
+        info_collected: Dict[str, str]
+    ) -> Dict:
+        """Async classify_followup_intent (LLM call via ainvoke)."""
+        logger.info("🔍 === CLASSIFYING FOLLOW-UP INTENT ===")
         
+        key = _intent_key(user_message, has_previous_response, info_collected)
+        known = self._known_intent(user_message, key)
+        if known is not None:
+            return known
         
+        try:
+            conversation = self._intent_conversation(user_message, has_previous_response, info_collected)
+            async with llm_semaphore():
+                response = await self.llm.ainvoke(conversation)
+            return self._parse_classification(response.content, key)
         
-        # Classify the intent
-        classification = self.classify_followup_intent(
-            user_message=query,
-            has_previous_response=has_previous_response,
-            info_collected=info_collected
-        )
+        except Exception as e:
+            logger.error("❌ Intent classification failed: %s", e, exc_info=True)
+            return self._fallback_classification()
+    
+    def _apply_intent(self, state: Dict, classification: Dict, reply: Optional[str] = None) -> Dict:
+        """
+        Update state for a classified follow-up.
         
+        reply is the clarification (or doubt) answer for the intents that
+        respond without reprocessing.
+        """
         intent_type = classification["intent_type"]
-        requires_reprocessing = classification["requires_reprocessing"]
         
         # Update state based on intent
         if intent_type == "new_info_addition":
@@ -194,9 +291,7 @@ YOUR CLASSIFICATION:"""
             state["update_type"] = "clarification"
             # Generate clarification without full reprocessing
             state["needs_clarification"] = True
-            state["clarification_question"] = self._generate_clarification_response(
-                query, response, info_collected
-            )
+            state["clarification_question"] = reply
             
         elif intent_type == "doubt_about_response":
             logger.info("🤔 Handling: Doubt about response")
@@ -204,9 +299,7 @@ YOUR CLASSIFICATION:"""
             state["update_type"] = "clarification"
             # Address doubt with additional explanation
             state["needs_clarification"] = True
-            state["clarification_question"] = self._address_doubt(
-                query, response, info_collected
-            )
+            state["clarification_question"] = reply
             
         elif intent_type == "new_question":
             logger.info("🆕 Handling: New question")
@@ -218,18 +311,90 @@ YOUR CLASSIFICATION:"""
         
         return state
     
-    def _generate_clarification_response(
-        self,
-        query: str,
-        previous_response: str,
-        info_collected: Dict
-    ) -> str:
-        """Generate clarification response without full reprocessing."""
+    def handle_update(self, state: Dict) -> Dict:
+        """
+        Main entry point for handling follow-up interactions.
+        
+        This determines:
+        1. What the user intends
+        2. Whether we need to reprocess (re-analyze, re-gather, re-generate)
+        3. How to route the request
+        """
+        query = state.get("query", "")
+        messages = state.get("messages", [])
+        info_collected = state.get("info_collected", {})
+        response = state.get("response", "")
+        
+        # Check if this is a follow-up (we have previous messages)
+        has_previous_response = _is_follow_up(query, messages, response)
+        
+        if not has_previous_response:
+            # First interaction, proceed normally
+            logger.info("First interaction - no update handling needed")
+            return state
+        
+        # Previous advice quoted in the clarification/doubt prompts, sliced once
+        preview = response[:self.PREVIOUS_RESPONSE_CHARS]
+        
+        # Classify the intent
+        classification = self.classify_followup_intent(
+            user_message=query,
+            has_previous_response=has_previous_response,
+            info_collected=info_collected
+        )
+        
+        reply = None
+        if classification["intent_type"] == "clarification_request":
+            reply = self._generate_clarification_response(query, preview, info_collected)
+        elif classification["intent_type"] == "doubt_about_response":
+            reply = self._address_doubt(query, preview, info_collected)
+        
+        return self._apply_intent(state, classification, reply)
+    
+    async def ahandle_update(self, state: Dict) -> Dict:
+        """
+        Async handle_update.
+        
+        When the intent needs the LLM classifier, the clarification reply (the
+        default and most common outcome) is generated alongside it and dropped
+        if the user turns out to be correcting or adding information.
+        """
+        query = state.get("query", "")
+        messages = state.get("messages", [])
+        info_collected = state.get("info_collected", {})
+        response = state.get("response", "")
+        
+        has_previous_response = _is_follow_up(query, messages, response)
+        
+        if not has_previous_response:
+            logger.info("First interaction - no update handling needed")
+            return state
+        
+        preview = response[:self.PREVIOUS_RESPONSE_CHARS]
+        key = _intent_key(query, has_previous_response, info_collected)
+        classification = self._known_intent(query, key)
+        clarification = None
+        if classification is None:
+            classification, clarification = await asyncio.gather(
+                self.aclassify_followup_intent(query, has_previous_response, info_collected),
+                self._agenerate_clarification_response(query, preview, info_collected)
+            )
+        
+        reply = None
+        if classification["intent_type"] == "clarification_request":
+            reply = clarification or await self._agenerate_clarification_response(
+                query, preview, info_collected
+            )
+        elif classification["intent_type"] == "doubt_about_response":
+            reply = await self._aaddress_doubt(query, preview, info_collected)
         
+        return self._apply_intent(state, classification, reply)
+    
+    def _clarification_conversation(self, query: str, previous_response: str) -> list:
         CLARIFICATION_PROMPT = f"""The user asked for clarification about your previous legal advice.
 
 PREVIOUS ADVICE:
-{previous_response[:1000]}
+{previous_response}
 
 USER'S CLARIFICATION REQUEST:
 {query}
@@ -244,31 +409,46 @@ Keep it concise.
 
 YOUR CLARIFICATION:"""
         
+        return [
+            SystemMessage(content="You are a helpful legal assistant providing clarifications."),
+            HumanMessage(content=CLARIFICATION_PROMPT)
+        ]
+    
+    def _generate_clarification_response(
+        self,
+        query: str,
+        previous_response: str,
+        info_collected: Dict
+    ) -> str:
+        """Generate clarification response without full reprocessing."""
         try:
-            conversation = [
-                SystemMessage(content="You are a helpful legal assistant providing clarifications."),
-                HumanMessage(content=CLARIFICATION_PROMPT)
-            ]
-            
-            response = self.llm.invoke(conversation)
+            response = self.llm.invoke(self._clarification_conversation(query, previous_response))
             return response.content.strip()
         
         except Exception as e:
-            logger.error(f"Failed to generate clarification: {e}")
+            logger.error("Failed to generate clarification: %s", e)
             return f"I understand you need clarification about: {query}. Let me provide more detail on this specific point..."
     
-    def _address_doubt(
+    async def _agenerate_clarification_response(
         self,
         query: str,
         previous_response: str,
         info_collected: Dict
     ) -> str:
-        """Address user's doubt or concern about the advice."""
+        try:
+            async with llm_semaphore():
+                response = await self.llm.ainvoke(self._clarification_conversation(query, previous_response))
+            return response.content.strip()
         
+        except Exception as e:
+            logger.error("Failed to generate clarification: %s", e)
+            return f"I understand you need clarification about: {query}. Let me provide more detail on this specific point..."
+    
+    def _doubt_conversation(self, query: str, previous_response: str) -> list:
         DOUBT_PROMPT = f"""The user has expressed doubt or concern about your legal advice.
 
 PREVIOUS ADVICE:
-{previous_response[:1000]}
+{previous_response}
 
 USER'S CONCERN:
 {query}
@@ -282,20 +462,53 @@ Respond in a way that:
 
 YOUR RESPONSE:"""
         
+        return [
+            SystemMessage(content="You are a professional legal assistant addressing concerns."),
+            HumanMessage(content=DOUBT_PROMPT)
+        ]
+    
+    def _address_doubt(
+        self,
+        query: str,
+        previous_response: str,
+        info_collected: Dict
+    ) -> str:
+        """Address user's doubt or concern about the advice."""
         try:
-            conversation = [
-                SystemMessage(content="You are a professional legal assistant addressing concerns."),
-                HumanMessage(content=DOUBT_PROMPT)
-            ]
-            
-            response = self.llm.invoke(conversation)
+            response = self.llm.invoke(self._doubt_conversation(query, previous_response))
+            return response.content.strip()
+        
+        except Exception as e:
+            logger.error("Failed to address doubt: %s", e)
+            return "I understand your concern. Let me provide additional context on this matter..."
+    
+    async def _aaddress_doubt(
+        self,
+        query: str,
+        previous_response: str,
+        info_collected: Dict
+    ) -> str:
+        try:
+            async with llm_semaphore():
+                response = await self.llm.ainvoke(self._doubt_conversation(query, previous_response))
             return response.content.strip()
         
         except Exception as e:
-            logger.error(f"Failed to address doubt: {e}")
+            logger.error("Failed to address doubt: %s", e)
             return "I understand your concern. Let me provide additional context on this matter..."
 
 
+_handler = None
+
+
+def _get_handler() -> UpdateHandler:
+    """Process-wide handler, so every follow-up reuses one pooled LLM client."""
+    global _handler
+    if _handler is None:
+        _handler = UpdateHandler()
+    return _handler
+
+
 # Integration with main.py
 def preprocess_user_message(state: Dict) -> Dict:
     """
@@ -306,6 +519,10 @@ def preprocess_user_message(state: Dict) -> Dict:
         workflow.add_edge(START, "preprocess")
         workflow.add_edge("preprocess", "analyze_query")
     """
-    handler = UpdateHandler()
-    updated_state = handler.handle_update(state)
-    return updated_state
\ No newline at end of file
+    updated_state = _get_handler().handle_update(state)
+    return updated_state
+
+
+async def apreprocess_user_message(state: Dict) -> Dict:
+    """Async preprocess_user_message (for async graph wiring)."""
+    return await _get_handler().ahandle_update(state)
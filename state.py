@@ -27,6 +27,7 @@ class FamilyLawState(MessagesState):
     follow_up_question: Optional[str] = None
     gathering_step: int = 0
     current_question_target: Optional[str] = None
+    case_information: Optional[str] = None  # Rendered info_collected for the generator prompt
     
     # Re-validation support
     revalidation_mode: bool = False
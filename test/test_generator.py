@@ -0,0 +1,153 @@
+"""
+Tests for the generator's precedent selection (score floor, near-duplicate
+filtering) and token-budgeted history trimming.
+"""
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph.message import add_messages
+
+from nodes import generator
+from nodes.generator import DUPLICATE_JACCARD, MIN_CHUNK_SCORE, _shingles, select_chunks
+
+WORDS = [f"word{i}" for i in range(30)]
+
+
+def _chunk(title, words, score=0.9):
+    return {"content": " ".join(words), "score": score, "metadata": {"title": title}}
+
+
+def _with_last_replaced(count):
+    return WORDS[:-count] + [f"other{i}" for i in range(count)]
+
+
+def _jaccard(a, b):
+    a, b = _shingles(" ".join(a)), _shingles(" ".join(b))
+    return len(a & b) / len(a | b)
+
+
+def test_near_duplicate_above_threshold_is_dropped():
+    variant = _with_last_replaced(5)
+    assert _jaccard(WORDS, variant) > DUPLICATE_JACCARD
+
+    selected = select_chunks([_chunk("original", WORDS, 0.9), _chunk("copy", variant, 0.8)])
+    assert [c["metadata"]["title"] for c in selected] == ["original"]
+
+
+def test_overlap_below_threshold_is_kept():
+    variant = _with_last_replaced(8)
+    assert _jaccard(WORDS, variant) <= DUPLICATE_JACCARD
+
+    selected = select_chunks([_chunk("original", WORDS, 0.9), _chunk("related", variant, 0.8)])
+    assert [c["metadata"]["title"] for c in selected] == ["original", "related"]
+
+
+def test_higher_scoring_duplicate_wins():
+    selected = select_chunks([_chunk("low", WORDS, 0.5), _chunk("high", WORDS, 0.95)])
+    assert [c["metadata"]["title"] for c in selected] == ["high"]
+
+
+def test_short_and_empty_contents_compare_whole():
+    assert _shingles("Custody Order") == {"custody order"}
+    selected = select_chunks([
+        _chunk("a", ["custody", "order"], 0.9),
+        _chunk("b", ["custody", "order"], 0.8),
+        {"content": None, "score": 0.7, "metadata": {"title": "empty"}},
+    ])
+    assert [c["metadata"]["title"] for c in selected] == ["a", "empty"]
+
+
+def test_weak_matches_dropped_but_best_always_kept():
+    weak = MIN_CHUNK_SCORE - 0.05
+    selected = select_chunks([
+        _chunk("best", WORDS, weak),
+        _chunk("weaker", [f"x{i}" for i in range(30)], weak - 0.01),
+    ])
+    assert [c["metadata"]["title"] for c in selected] == ["best"]
+
+
+def test_at_most_five_chunks():
+    chunks = [_chunk(f"c{n}", [f"c{n}w{i}" for i in range(30)], 0.9 - n / 100) for n in range(8)]
+    assert len(select_chunks(chunks)) == 5
+
+
+def _history(*contents):
+    return [(HumanMessage if i % 2 == 0 else AIMessage)(content=c) for i, c in enumerate(contents)]
+
+
+def test_trim_history_keeps_messages_exactly_at_budget(monkeypatch):
+    # Without tiktoken, history is budgeted at CHARS_PER_TOKEN characters per token
+    monkeypatch.setattr(generator, "_get_encoding", lambda: None)
+    messages = _history("a" * 40, "b" * 40, "c" * 40)  # 10 tokens each
+
+    assert generator.trim_history(messages, budget=30) == messages
+    assert generator.trim_history(messages, budget=29) == messages[1:]
+    assert generator.trim_history(messages, budget=20) == messages[1:]
+
+
+def test_trim_history_truncates_oversized_latest_message(monkeypatch):
+    monkeypatch.setattr(generator, "_get_encoding", lambda: None)
+    messages = _history("short", "x" * 400)
+
+    trimmed = generator.trim_history(messages, budget=10)
+    assert len(trimmed) == 1
+    assert isinstance(trimmed[0], AIMessage)
+    assert trimmed[0].content == "x" * 40
+    assert messages[1].content == "x" * 400  # original left untouched
+
+    assert generator.trim_history(messages, budget=0) == []
+
+
+def test_trim_history_with_tiktoken_budget():
+    encoding = generator._get_encoding()
+    if encoding is None:
+        pytest.skip("tiktoken cl100k_base not available offline")
+    messages = _history("one two three", "four five six")
+    tokens = [len(encoding.encode(m.content)) for m in messages]
+
+    assert generator.trim_history(messages, budget=sum(tokens)) == messages
+    assert generator.trim_history(messages, budget=sum(tokens) - 1) == messages[1:]
+
+
+def test_truncated_copy_does_not_replace_stored_message(monkeypatch):
+    monkeypatch.setattr(generator, "_get_encoding", lambda: None)
+    stored = add_messages([], _history("x" * 25000))
+
+    trimmed = generator.trim_history(stored, budget=50)
+    assert trimmed[0].content == "x" * 200
+    assert trimmed[0].id != stored[0].id
+    assert stored[0].content == "x" * 25000
+
+
+class _FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, conversation, **kwargs):
+        self.prompts.append(conversation)
+        return AIMessage(content="advice " * 100)
+
+
+def test_generate_response_keeps_full_history_in_state(monkeypatch):
+    monkeypatch.setattr(generator, "_get_encoding", lambda: None)
+    llm = _FakeLLM()
+    monkeypatch.setattr(generator, "select_llm", lambda *args: llm)
+    stored = add_messages([], _history("x" * 25000))
+    state = {
+        "query": "custody after divorce",
+        "messages": stored,
+        "retrieved_chunks": [_chunk("precedent", WORDS)],
+        "include_reasoning": False,
+    }
+    state["retrieved_chunks"][0]["metadata"]["category"] = "custody"
+
+    result = generator.generate_response(state)
+
+    # The prompt carries the trimmed copy...
+    budget_chars = generator.HISTORY_TOKEN_BUDGET * generator.CHARS_PER_TOKEN
+    assert [m.content for m in llm.prompts[0][1:-1]] == ["x" * budget_chars]
+    # ...but merging the node output back leaves the stored message intact
+    merged = add_messages(stored, result["messages"])
+    assert merged[0].id == stored[0].id
+    assert merged[0].content == "x" * 25000
+    assert not any(m.content == "x" * budget_chars for m in merged)
@@ -0,0 +1,64 @@
+"""
+Routing tests for the preprocess hook: follow-ups go through the update
+handler before analysis, and the gatherer's own questions bypass it.
+"""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+import graph
+
+FOLLOW_UP_STATE = {
+    "conversation_id": "test_graph",
+    "query": "What does that mean?",
+    "messages": [
+        HumanMessage(content="My husband wants a divorce"),
+        AIMessage(content="Here is the advice..."),
+        HumanMessage(content="What does that mean?"),
+    ],
+    "response": "Here is the advice...",
+    "analysis_complete": True,
+    "info_collected": {"marriage_date": "2015"},
+}
+
+
+@pytest.fixture(autouse=True)
+def execution_logs_in_tmp(tmp_path, monkeypatch):
+    # node_logger writes ./logs/executions relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def preprocess_calls(monkeypatch):
+    calls = []
+
+    async def fake_preprocess(state):
+        calls.append(state["query"])
+        state["needs_clarification"] = True
+        state["clarification_question"] = "It means the court decides interim support."
+        return state
+
+    monkeypatch.setattr(graph, "apreprocess_user_message", fake_preprocess)
+    return calls
+
+
+def test_preprocess_runs_first_and_routes_clarification(preprocess_calls):
+    app = graph.create_graph()
+    assert ("__start__", "preprocess") in {(e.source, e.target) for e in app.get_graph().edges}
+
+    result = asyncio.run(app.ainvoke(dict(FOLLOW_UP_STATE)))
+
+    assert preprocess_calls == ["What does that mean?"]
+    assert result["message_type"] == "clarification"
+    assert result["response"] == "It means the court decides interim support."
+
+
+def test_gathering_answers_skip_the_update_handler(preprocess_calls):
+    state = {**FOLLOW_UP_STATE, "query": "2015", "in_gathering_phase": True}
+
+    result = asyncio.run(graph.preprocess_node(state))
+
+    assert preprocess_calls == []
+    assert not result.get("needs_clarification")
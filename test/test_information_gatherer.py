@@ -0,0 +1,66 @@
+"""
+Tests for the gatherer's regex fast path (_quick_extract), which answers common
+short replies without an LLM call and must return None whenever it is unsure.
+"""
+
+import pytest
+
+from nodes.information_gatherer import QUICK_EXTRACT_MAX_CHARS, InformationGatherer
+
+
+@pytest.fixture
+def gatherer():
+    return InformationGatherer(huggingface_api_key="hf_test")
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("2019", "2019"),
+    ("We got married in March 2015.", "March 2015"),
+    ("on 12th Dec, 2008 in Pune", "12th Dec, 2008"),
+    ("sept 1999", "sept 1999"),
+])
+def test_marriage_dates(gatherer, reply, expected):
+    assert gatherer._quick_extract("When did you marry?", reply, "marriage_date") == expected
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("two kids", "two kids"),
+    ("We have 3 children together", "3 children"),
+    ("no children", "no children"),
+])
+def test_child_counts(gatherer, reply, expected):
+    assert gatherer._quick_extract("How many children?", reply, "number_of_children") == expected
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("Yes", "yes"),
+    ("yep!", "yes"),
+    ("No.", "no"),
+    ("not yet", "no"),
+])
+def test_bare_yes_no_for_flag_targets(gatherer, reply, expected):
+    assert gatherer._quick_extract("Have you filed a case?", reply, "has_filed_case") == expected
+
+
+@pytest.mark.parametrize("reply, target", [
+    ("I think around 2019 or 2020?", "number_of_children"),  # a year is not a count
+    ("my son lives with me", "number_of_children"),          # no count given
+    ("no idea, he left in 2019", "has_filed_case"),          # more than a bare no
+    ("yes", "marriage_date"),                                # yes/no only for flag targets
+    ("We married after we met in college", "marriage_date"),
+])
+def test_unsure_replies_go_to_the_llm(gatherer, reply, target):
+    assert gatherer._quick_extract("Question?", reply, target) is None
+
+
+def test_long_replies_skip_the_regexes(gatherer):
+    reply = "We married in 2015 " + "and then a lot happened " * 5
+    assert len(reply) > QUICK_EXTRACT_MAX_CHARS
+    assert gatherer._quick_extract("When did you marry?", reply, "marriage_date") is None
+
+
+def test_gender_keywords_are_whole_word(gatherer):
+    assert gatherer._quick_extract("Are you the wife?", "I am his wife", "user_gender") == "female"
+    assert gatherer._quick_extract("Your gender?", "the husband", "user_gender") == "male"
+    # "the" and "many" must not read as he/man
+    assert gatherer._quick_extract("Your gender?", "there are many", "user_gender") is None
@@ -0,0 +1,76 @@
+"""
+Guards for the huggingface_hub internals llm_client depends on.
+
+PooledAsyncInferenceClient mirrors AsyncInferenceClient._get_client_session and
+configure_hf_session uses configure_http_backend. These tests fail loudly if an
+upgrade moves either, instead of async LLM calls breaking at runtime.
+"""
+
+import asyncio
+import inspect
+
+import huggingface_hub
+from huggingface_hub import AsyncInferenceClient
+
+import llm_client
+from llm_client import PooledAsyncInferenceClient, get_chat_model
+
+
+def test_huggingface_hub_within_pinned_range():
+    major, minor = (int(part) for part in huggingface_hub.__version__.split(".")[:2])
+    assert (0, 36) <= (major, minor) < (1, 0)
+
+
+def test_async_client_session_hook_unchanged():
+    parameters = inspect.signature(AsyncInferenceClient._get_client_session).parameters
+    assert list(parameters) == ["self", "headers"]
+    # Requests still go through the hook we override
+    assert "self._get_client_session(" in inspect.getsource(AsyncInferenceClient)
+
+    client = AsyncInferenceClient()
+    for attribute in ("_sessions", "headers", "cookies", "timeout", "trust_env"):
+        assert hasattr(client, attribute), attribute
+
+
+def test_pooled_sessions_share_a_connector_that_outlives_them():
+    async def run():
+        client = PooledAsyncInferenceClient()
+        first = client._get_client_session()
+        second = client._get_client_session(headers={"X-Test": "1"})
+        connector = first.connector
+        try:
+            assert second.connector is connector
+            assert second.headers["X-Test"] == "1"
+        finally:
+            await first.close()
+            await second.close()
+        assert not connector.closed
+        assert client._sessions == {}
+        await llm_client.close_connectors()
+
+    asyncio.run(run())
+
+
+def test_get_chat_model_uses_pooled_async_client():
+    model = get_chat_model(
+        max_new_tokens=64,
+        temperature=0.1,
+        task="text-generation",
+        api_key="hf_test",
+        repo_id="meta-llama/Llama-3.1-8B-Instruct"
+    )
+    assert isinstance(model.llm.async_client, PooledAsyncInferenceClient)
+    # One shared client per configuration
+    assert get_chat_model(
+        max_new_tokens=64,
+        temperature=0.1,
+        task="text-generation",
+        api_key="hf_test",
+        repo_id="meta-llama/Llama-3.1-8B-Instruct"
+    ) is model
+
+
+def test_http_backend_hook_available():
+    # Within the pinned range the pooled requests session is actually installed
+    assert llm_client.configure_http_backend is not None
+    llm_client.configure_hf_session()
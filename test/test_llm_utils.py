@@ -0,0 +1,39 @@
+"""
+Tests for reading JSON out of LLM replies (llm_utils.parse_llm_json and the
+gatherer's stop-sequence variant).
+"""
+
+from llm_utils import parse_llm_json
+from nodes.information_gatherer import _parse_reply
+
+
+def test_parses_fenced_json():
+    text = 'Here you go:\n```json\n{"extracted_answer": "2019"}\n```'
+    assert parse_llm_json(text) == {"extracted_answer": "2019"}
+
+
+def test_parses_json_after_preamble_and_before_trailing_text():
+    text = 'Sure! {"extracted_answer": "two children", "next_question": "Where?"} Hope that helps {'
+    assert parse_llm_json(text) == {"extracted_answer": "two children", "next_question": "Where?"}
+
+
+def test_skips_braces_that_do_not_start_an_object():
+    text = 'Format: {answer} -> {"extracted_answer": "yes"}'
+    assert parse_llm_json(text) == {"extracted_answer": "yes"}
+
+
+def test_returns_none_without_an_object():
+    assert parse_llm_json("NOT_PROVIDED") is None
+    assert parse_llm_json('["a", "b"]') is None
+    assert parse_llm_json("") is None
+
+
+def test_truncated_json_is_rejected():
+    assert parse_llm_json('{"extracted_answer": "2019", "next_question": "When did') is None
+
+
+def test_reply_cut_at_stop_sequence_is_restored():
+    # The "}" stop sequence is usually left out of the returned text
+    assert _parse_reply('{"extracted_answer": "female"') == {"extracted_answer": "female"}
+    assert _parse_reply('{"extracted_answer": "female"}') == {"extracted_answer": "female"}
+    assert _parse_reply('{"extracted_answer": "fem') is None
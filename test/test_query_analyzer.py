@@ -0,0 +1,153 @@
+"""
+Tests for the query analyzer's keyword paths (the fallback analysis used when
+the LLM fails, the opt-in keyword shortcut that skips the LLM) and the batched
+bulk-analysis path.
+"""
+
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from nodes import query_analyzer
+from nodes.query_analyzer import _FALLBACK_CASE_TYPES, _FALLBACK_INFO_FLAGS, QueryAnalyzer
+
+LONG_TAIL = " ".join(["details"] * 60)
+
+QUERIES = [
+    "My husband beat me and his family keeps asking for dahej",
+    "Can I get custody of my children after separation?",
+    "I want a divorce, we have one child",
+    "How is alimony calculated?",
+    "Where is the nearest court?",
+    "MARRIAGE registration and CHILDREN",
+    "The white house",  # "hit" inside "white": substring semantics, as before
+]
+
+
+def _substring_analysis(query):
+    """The original one-`in`-check-per-keyword implementation."""
+    lower = query.lower()
+    case_type = next(
+        (case for words, case, _ in _FALLBACK_CASE_TYPES if any(w in lower for w in words)),
+        "general"
+    )
+    flags = {flag for words, flag in _FALLBACK_INFO_FLAGS if any(w in lower for w in words)}
+    return case_type, flags
+
+
+@pytest.fixture
+def analyzer():
+    return QueryAnalyzer(huggingface_api_key="hf_test")
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_keyword_scan_matches_substring_checks(analyzer, query):
+    result = analyzer.fallback_analysis(query)
+    assert (result["case_type"], set(result["info_collected"])) == _substring_analysis(query)
+
+
+def test_case_type_priority_and_flags(analyzer):
+    result = analyzer.fallback_analysis("Dowry harassment and threats after marriage, custody of child")
+    assert result["case_type"] == "domestic_violence"
+    assert result["info_collected"] == {"marriage_mentioned": "yes", "children_mentioned": "yes"}
+
+
+def test_confidence_follows_query_length(analyzer):
+    assert analyzer.fallback_analysis("divorce help")["intent_confidence"] == "low"
+    medium = analyzer.fallback_analysis("divorce " + " ".join(["word"] * 25))
+    assert medium["intent_confidence"] == "medium"
+    assert medium["info_needed_list"]
+    high = analyzer.fallback_analysis("divorce " + LONG_TAIL)
+    assert high["intent_confidence"] == "high"
+    assert high["has_sufficient_info"]
+
+
+def test_keyword_shortcut_off_by_default(analyzer, monkeypatch):
+    monkeypatch.setattr(query_analyzer, "ANALYZER_KEYWORD_SHORTCUT", False)
+    assert analyzer._keyword_shortcut("divorce " + LONG_TAIL, force_llm=False) is None
+
+
+def test_keyword_shortcut_skips_llm_for_long_typed_queries(analyzer, monkeypatch):
+    monkeypatch.setattr(query_analyzer, "ANALYZER_KEYWORD_SHORTCUT", True)
+    result = analyzer._keyword_shortcut("My husband wants a divorce " + LONG_TAIL, force_llm=False)
+    assert result["case_type"] == "divorce"
+
+
+@pytest.mark.parametrize("query, force_llm", [
+    ("divorce " + LONG_TAIL, True),                     # caller insists on the LLM
+    ("I want a divorce, what are my options?", False),  # too short to trust keywords
+    ("Where do I file papers? " + LONG_TAIL, False),    # no case type keyword
+])
+def test_keyword_shortcut_defers_to_llm(analyzer, monkeypatch, query, force_llm):
+    monkeypatch.setattr(query_analyzer, "ANALYZER_KEYWORD_SHORTCUT", True)
+    assert analyzer._keyword_shortcut(query, force_llm=force_llm) is None
+
+
+def _analysis(intent, needed=()):
+    return {"user_intent": intent, "intent_confidence": "high",
+            "info_provided": {"topic": intent}, "info_needed": list(needed)}
+
+
+class _FakeLLM:
+    """invoke() answers batches with a canned reply; stream() answers single queries."""
+
+    def __init__(self, batch_reply):
+        self.batch_reply = batch_reply
+        self.batch_calls = []
+        self.single_calls = 0
+
+    def invoke(self, conversation, **kwargs):
+        self.batch_calls.append(conversation[-1].content)
+        return AIMessage(content=self.batch_reply)
+
+    def stream(self, conversation, **kwargs):
+        self.single_calls += 1
+        query = conversation[-1].content.rsplit("USER QUERY:", 1)[1].split("ANALYSIS")[0].strip()
+        yield AIMessageChunk(content=json.dumps(_analysis("single " + query)))
+
+
+@pytest.fixture
+def batch_analyzer(analyzer):
+    query_analyzer.clear_analysis_cache()
+    yield analyzer
+    query_analyzer.clear_analysis_cache()
+
+
+def test_batched_results_stay_aligned_with_queries(batch_analyzer):
+    reply = "Here you go:\n" + json.dumps([_analysis("first"), "garbage", _analysis("third", ["dates"])])
+    llm = batch_analyzer.__dict__["llm"] = _FakeLLM(reply)
+
+    results = batch_analyzer.analyze_queries_batched(["q one", "custody of my child", "q three"])
+
+    assert len(llm.batch_calls) == 1
+    assert "QUERY 2:\ncustody of my child" in llm.batch_calls[0]
+    assert results[0]["user_intent"] == "first"
+    assert results[0]["has_sufficient_info"]
+    # A non-object item falls back to keywords for that query only
+    assert results[1]["case_type"] == "child_custody"
+    assert results[2]["info_needed_list"] == ["dates"]
+    assert llm.single_calls == 0
+
+
+def test_batches_are_split_by_batch_size(batch_analyzer):
+    llm = batch_analyzer.__dict__["llm"] = _FakeLLM(json.dumps([_analysis("a"), _analysis("b")]))
+
+    results = batch_analyzer.analyze_queries_batched(["q1", "q2", "q3", "q4"], batch_size=2)
+
+    assert len(llm.batch_calls) == 2
+    assert [r["user_intent"] for r in results] == ["a", "b", "a", "b"]
+
+
+@pytest.mark.parametrize("reply", [
+    json.dumps([_analysis("only one")]),  # wrong length
+    '{"user_intent": "not an array"}',
+    "no JSON at all",
+])
+def test_bad_batch_reply_reruns_each_query(batch_analyzer, reply):
+    llm = batch_analyzer.__dict__["llm"] = _FakeLLM(reply)
+
+    results = batch_analyzer.analyze_queries_batched(["q one", "q two"])
+
+    assert llm.single_calls == 2
+    assert [r["user_intent"] for r in results] == ["single q one", "single q two"]
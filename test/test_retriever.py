@@ -8,9 +8,16 @@ This will help you diagnose issues with:
 4. Search functionality
 """
 
+import io
+import os
 import sys
+import argparse
+import faulthandler
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
 from pymilvus import connections, Collection, utility
-from sentence_transformers import SentenceTransformer
 import traceback
 
 # Configuration
@@ -19,6 +26,90 @@ MILVUS_PORT = "19530"
 COLLECTION_NAME = "family_law_cases"
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
+class _BufferedStdout:
+    """
+    sys.stdout proxy: while a thread runs a @_buffered test, its output is held
+    and written in one piece when the test ends (so concurrent tests don't interleave).
+    """
+    
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer or self._stream).write(text)
+    
+    def flush(self):
+        if getattr(self._local, "buffer", None) is None:
+            self._stream.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+    
+    def start(self):
+        self._local.buffer = io.StringIO()
+    
+    def finish(self):
+        text, self._local.buffer = self._local.buffer.getvalue(), None
+        with self._lock:
+            self._stream.write(text)
+            self._stream.flush()
+
+
+def _buffered(test):
+    """Emit a test's output with a single write when stdout is a _BufferedStdout."""
+    @wraps(test)
+    def wrapper(*args, **kwargs):
+        stdout = sys.stdout
+        if not isinstance(stdout, _BufferedStdout):
+            return test(*args, **kwargs)
+        stdout.start()
+        try:
+            return test(*args, **kwargs)
+        finally:
+            stdout.finish()
+    return wrapper
+
+
+@lru_cache(maxsize=1)
+def _get_collection_handle():
+    """One Collection handle for the run (each construction is a DescribeCollection RPC)."""
+    return Collection(COLLECTION_NAME)
+
+
+@lru_cache(maxsize=1)
+def _get_collection():
+    """The collection handle, loaded once for the whole run."""
+    collection = _get_collection_handle()
+    collection.load()
+    return collection
+
+def _search_params(collection):
+    """Search params for the collection's index type (ef for HNSW, nprobe for IVF)."""
+    index_type = collection.indexes[0].params.get("index_type", "") if collection.indexes else ""
+    if index_type == "HNSW":
+        return {"metric_type": "COSINE", "params": {"ef": 64}}
+    return {"metric_type": "COSINE", "params": {"nprobe": 16}}
+
+# Set VERBOSE=1 to also print sample embedding values
+VERBOSE = bool(os.getenv("VERBOSE"))
+
+# Tests that --skip can leave out (connection and collection checks always run)
+SKIPPABLE_TESTS = ("info", "model", "search", "retriever")
+
+# Probe queries for tests 4 and 5, encoded together in one batch
+SAMPLE_QUERY = "test query"
+SEARCH_QUERY = "How to file for divorce?"
+
+@lru_cache(maxsize=1)
+def _get_model():
+    """The retriever's embedding model, so tests 4-6 load it only once."""
+    from nodes.retriever import get_model
+    return get_model()
+
+@_buffered
 def test_milvus_connection():
     """Test 1: Check if Milvus is running and accessible."""
     print("\n" + "="*60)
@@ -42,6 +133,7 @@ def test_milvus_connection():
         return False
 
 
+@_buffered
 def test_collection_exists():
     """Test 2: Check if collection exists."""
     print("\n" + "="*60)
@@ -60,10 +152,11 @@ def test_collection_exists():
             return False
     except Exception as e:
         print(f"❌ Error checking collection: {e}")
-        traceback.print_exc()
+        sys.stderr.write(traceback.format_exc())
         return False
 
 
+@_buffered
 def test_collection_info():
     """Test 3: Get collection information."""
     print("\n" + "="*60)
@@ -71,13 +164,14 @@ def test_collection_info():
     print("="*60)
     
     try:
-        collection = Collection(COLLECTION_NAME)
+        # Entity count and schema are metadata; no need to load vectors here
+        collection = _get_collection_handle()
         
         # Get collection stats
-        collection.load()
         num_entities = collection.num_entities
         
-        print(f"✅ Collection loaded successfully")
+        print(f"✅ Collection info retrieved")
+        print(f"   📦 Load state: {utility.load_state(COLLECTION_NAME)}")
         print(f"   📊 Total entities: {num_entities}")
         
         if num_entities == 0:
@@ -94,80 +188,105 @@ def test_collection_info():
         return True
     except Exception as e:
         print(f"❌ Error getting collection info: {e}")
-        traceback.print_exc()
+        sys.stderr.write(traceback.format_exc())
         return False
 
 
+def precompute_embeddings(model, texts):
+    """Encode all probe texts in a single call, keyed by text."""
+    vectors = model.encode(texts, batch_size=8, normalize_embeddings=True, show_progress_bar=False)
+    return dict(zip(texts, vectors))
+
+
+@_buffered
 def test_embedding_model():
-    """Test 4: Check if embedding model loads."""
+    """Test 4: Check if embedding model loads (returns the probe embeddings)."""
     print("\n" + "="*60)
     print("TEST 4: Embedding Model")
     print("="*60)
     
     try:
         print(f"Loading model: {MODEL_NAME}...")
-        model = SentenceTransformer(MODEL_NAME)
+        model = _get_model()
         print(f"✅ Model loaded successfully")
+        print(f"   🖥️  Device: {model.device}")
+        
+        # Warm-up pass (device context, kernel selection, tokenizer) so the
+        # timed encode below reflects steady-state latency
+        model.encode(["warmup"], batch_size=1, show_progress_bar=False)
         
         # Test encoding
-        test_text = "test query"
-        embedding = model.encode([test_text])[0]
+        start = time.perf_counter()
+        embeddings = precompute_embeddings(model, [SAMPLE_QUERY, SEARCH_QUERY])
+        print(f"   ⏱️  Encode time: {(time.perf_counter() - start) * 1000:.1f} ms")
+        embedding = embeddings[SAMPLE_QUERY]
         print(f"   📐 Embedding dimension: {len(embedding)}")
-        print(f"   🔢 Sample values: {embedding[:5]}")
+        if VERBOSE:
+            print(f"   🔢 Sample values: {embedding[:5]}")
         
-        return model
+        return embeddings
     except Exception as e:
         print(f"❌ Error loading model: {e}")
-        traceback.print_exc()
+        sys.stderr.write(traceback.format_exc())
         return None
 
 
-def test_search(model):
+@_buffered
+def test_search(embeddings):
     """Test 5: Perform a test search."""
     print("\n" + "="*60)
     print("TEST 5: Search Functionality")
     print("="*60)
     
     try:
-        collection = Collection(COLLECTION_NAME)
-        collection.load()
+        collection = _get_collection()
         
         # Test query
-        test_query = "How to file for divorce?"
+        test_query = SEARCH_QUERY
         print(f"Test query: '{test_query}'")
         
-        # Generate embedding
-        query_embedding = model.encode([test_query])[0].tolist()
-        print(f"✅ Query embedding generated ({len(query_embedding)} dimensions)")
+        # Precomputed in test 4
+        query_embedding = embeddings[test_query]  # float32 ndarray, as the retriever passes it
+        print(f"✅ Query embedding ready ({len(query_embedding)} dimensions)")
         
         # Search
-        search_params = {"metric_type": "COSINE", "params": {"nprobe": 10}}
+        search_params = _search_params(collection)
+        print(f"   🔧 Search params: {search_params['params']}")
         
         results = collection.search(
             data=[query_embedding],
             anns_field="embedding",
             param=search_params,
             limit=5,
-            output_fields=["content", "title", "category", "url"]
+            output_fields=["title", "category", "url"]
         )
         
+        # Content is the bulky field; fetch it only for the hits shown
+        hit_ids = [hit.id for hit in results[0]]
+        contents = {
+            row["id"]: row["content"]
+            for row in collection.query(expr=f"id in {hit_ids}", output_fields=["content"])
+        } if hit_ids else {}
+        
         print(f"✅ Search completed")
         print(f"\n📋 Top {len(results[0])} results:")
         
         for i, hit in enumerate(results[0], 1):
+            entity = hit.to_dict().get("entity") or {}
             print(f"\n   Result {i}:")
             print(f"   Score: {hit.score:.4f}")
-            print(f"   Title: {hit.entity.get('title', 'N/A')}")
-            print(f"   Category: {hit.entity.get('category', 'N/A')}")
-            print(f"   Content preview: {hit.entity.get('content', '')[:150]}...")
+            print(f"   Title: {entity.get('title', 'N/A')}")
+            print(f"   Category: {entity.get('category', 'N/A')}")
+            print(f"   Content preview: {contents.get(hit.id, '')[:150]}...")
         
         return True
     except Exception as e:
         print(f"❌ Search failed: {e}")
-        traceback.print_exc()
+        sys.stderr.write(traceback.format_exc())
         return False
 
 
+@_buffered
 def test_retriever_function():
     """Test 6: Test the actual retriever function."""
     print("\n" + "="*60)
@@ -201,8 +320,9 @@ def test_retriever_function():
         if retrieved_chunks:
             print(f"\n   First chunk:")
             first_chunk = retrieved_chunks[0]
+            metadata = first_chunk.get('metadata') or {}
             print(f"   - Score: {first_chunk.get('score', 0):.4f}")
-            print(f"   - Title: {first_chunk.get('metadata', {}).get('title', 'N/A')}")
+            print(f"   - Title: {metadata.get('title', 'N/A')}")
             print(f"   - Content: {first_chunk.get('content', '')[:200]}...")
         else:
             print(f"\n   ⚠️  No chunks retrieved!")
@@ -210,12 +330,28 @@ def test_retriever_function():
         return len(retrieved_chunks) > 0
     except Exception as e:
         print(f"❌ Retriever function failed: {e}")
-        traceback.print_exc()
+        sys.stderr.write(traceback.format_exc())
         return False
 
 
-def main():
-    """Run all tests."""
+def _parse_skip(argv=None):
+    parser = argparse.ArgumentParser(description="Retriever & Milvus diagnostics")
+    parser.add_argument(
+        "--skip",
+        default="",
+        help=f"comma-separated tests to skip: {', '.join(SKIPPABLE_TESTS)} "
+             "(skipping model also skips search)"
+    )
+    args = parser.parse_args(argv)
+    skip = {name.strip() for name in args.skip.split(",") if name.strip()}
+    unknown = skip - set(SKIPPABLE_TESTS)
+    if unknown:
+        parser.error(f"unknown test(s): {', '.join(sorted(unknown))}")
+    return skip
+
+
+def main(skip=frozenset()):
+    """Run all tests (except those named in skip)."""
     print("\n" + "🔧"*30)
     print("RETRIEVER & MILVUS DIAGNOSTIC TESTS")
     print("🔧"*30)
@@ -235,21 +371,28 @@ def main():
         print("\n❌ Cannot proceed without collection")
         return
     
-    # Test 3: Collection info
-    results["collection_info"] = test_collection_info()
+    # Tests 3 and 4 are independent: overlap the Milvus RPCs with the model load
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        info_future = None if "info" in skip else executor.submit(test_collection_info)
+        model_future = None if "model" in skip else executor.submit(test_embedding_model)
+        if info_future:
+            results["collection_info"] = info_future.result()
+        embeddings = model_future.result() if model_future else None
     
     # Test 4: Embedding model
-    model = test_embedding_model()
-    results["embedding_model"] = model is not None
-    if not model:
-        print("\n❌ Cannot proceed without embedding model")
-        return
+    if model_future:
+        results["embedding_model"] = embeddings is not None
+        if not embeddings:
+            print("\n❌ Cannot proceed without embedding model")
+            return
     
-    # Test 5: Search
-    results["search"] = test_search(model)
+    # Test 5: Search (uses test 4's embeddings)
+    if embeddings and "search" not in skip:
+        results["search"] = test_search(embeddings)
     
     # Test 6: Retriever function
-    results["retriever_function"] = test_retriever_function()
+    if "retriever" not in skip:
+        results["retriever_function"] = test_retriever_function()
     
     # Summary
     print("\n" + "="*60)
@@ -272,4 +415,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    faulthandler.enable()  # tracebacks for native crashes in torch / grpc
+    sys.stdout = _BufferedStdout(sys.stdout)
+    main(_parse_skip())
\ No newline at end of file
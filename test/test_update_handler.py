@@ -0,0 +1,41 @@
+"""
+Tests for the follow-up intent shortcuts: only unambiguous openings may skip
+the LLM classifier; everything else must return None.
+"""
+
+import pytest
+
+from nodes.update_handler import _match_intent
+
+
+@pytest.mark.parametrize("message, intent_type, requires_reprocessing", [
+    ("Sorry, I meant 2019 not 2018", "correction", True),
+    ("Correction: we have two children", "correction", True),
+    ("That's wrong, he is my second husband", "correction", True),
+    ("  are you sure about the 90 day rule?", "doubt_about_response", False),
+    ("I doubt that applies to me", "doubt_about_response", False),
+    ("That doesn't sound right", "doubt_about_response", False),
+    ("What do you mean by interim maintenance?", "clarification_request", False),
+    ("What does that mean?", "clarification_request", False),
+    ("Can you please explain section 125?", "clarification_request", False),
+    ("Please clarify the second point", "clarification_request", False),
+])
+def test_unambiguous_openings_skip_the_classifier(message, intent_type, requires_reprocessing):
+    result = _match_intent(message)
+    assert result["intent_type"] == intent_type
+    assert result["requires_reprocessing"] is requires_reprocessing
+    assert result["specific_topic"] == message.strip()
+
+
+@pytest.mark.parametrize("message", [
+    "Actually we married in 2015 and separated last year",
+    "I don't think he will pay maintenance",
+    "My friend told me I can't get custody",
+    "What does the law say about custody?",
+    "He said I meant nothing to him",  # keyword mid-sentence
+    "Can you help me file for divorce?",
+    "Is that wrong under the Hindu Marriage Act?",
+    "",
+])
+def test_ambiguous_messages_go_to_the_classifier(message):
+    assert _match_intent(message) is None